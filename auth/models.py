@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+
+from core.database import Base
+
+class RevokedTokenModel(Base):
+    """
+    Revoked token model for refresh and access tokens that must no longer be accepted.
+
+    Attributes:
+        id (int): Primary key for the revocation.
+        jti (str): Id of the revoked token.
+        user_id (int): Owner of the token.
+        expires_at (DateTime): Expiry of the token (UTC); the row is only needed until then.
+        revoked_at (DateTime): Date and time when the token was revoked.
+    """
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(32), unique=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import APIRouter, status, Depends, Header
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -5,6 +6,7 @@ from core.database import get_db
 from auth.services import (
     get_token,
     get_refresh_token,
+    revoke_user_tokens,
     verify_email_token,
     resend_email_token,
 )
@@ -35,6 +37,7 @@ async def authenticate_user(data: OAuth2PasswordRequestForm = Depends(), db: Ses
 async def refresh_access_token(refresh_token: str = Header(), db: Session = Depends(get_db)):
     """
     Refresh the access token using the provided refresh token.
+    The refresh token is replaced by the one in the response.
 
     Args:
         refresh_token (str): Refresh token from the header.
@@ -46,6 +49,23 @@ async def refresh_access_token(refresh_token: str = Header(), db: Session = Depe
     return await get_refresh_token(token=refresh_token, db=db)
 
 
+@router.post("/logout", status_code=status.HTTP_200_OK)
+async def logout(refresh_token: str = Header(), authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """
+    Revoke the refresh token and the access token used for this request.
+
+    Args:
+        refresh_token (str): Refresh token from the header.
+        authorization (str): Optional "Bearer <access token>" header.
+        db (Session): Database session.
+
+    Returns:
+        dict: Success message.
+    """
+    access_token = authorization.split(' ')[-1] if authorization else None
+    return await revoke_user_tokens(refresh_token=refresh_token, access_token=access_token, db=db)
+
+
 @router.get("/verify", status_code=status.HTTP_200_OK)
 async def verify_email(token: str, db: Session = Depends(get_db)):
     """
@@ -9,6 +9,7 @@ from core.security import (
     create_refresh_token,
     get_token_payload,
     generate_activation_token,
+    revoked_tokens,
 )
 
 from auth.responses import TokenResponse
@@ -54,6 +55,10 @@ async def get_refresh_token(token, db):
     """
     Get a new access token using a refresh token.
 
+    The refresh token is rotated: it is revoked and a new one is returned.
+    Each refresh token is accepted once; new tokens are only issued after
+    its revocation has been committed.
+
     Args:
         token (str): Refresh token.
         db: Database session.
@@ -62,10 +67,10 @@ async def get_refresh_token(token, db):
         TokenResponse: Access and refresh tokens.
 
     Raises:
-        HTTPException: If the refresh token is invalid.
+        HTTPException: If the refresh token is invalid, expired or revoked.
     """
     payload = get_token_payload(token=token)
-    user_id = payload.get('id', None)
+    user_id = payload.get('id', None) if _is_refresh_token(payload) else None
 
     if not user_id:
         raise HTTPException(
@@ -83,7 +88,64 @@ async def get_refresh_token(token, db):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return await _get_user_token(user=user, refresh_token=token)
+    if not revoked_tokens.revoke(payload, db):
+        # Another request already rotated this token.
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid refresh token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return await _get_user_token(user=user)
+
+
+async def revoke_user_tokens(refresh_token, access_token, db):
+    """
+    Log out by revoking the refresh token and, if given, the access token.
+
+    Args:
+        refresh_token (str): Refresh token.
+        access_token (str): Access token of the same user, or None.
+        db: Database session.
+
+    Returns:
+        dict: Success message.
+
+    Raises:
+        HTTPException: If the refresh token is invalid, expired or already revoked.
+    """
+    payload = get_token_payload(token=refresh_token)
+
+    if not _is_refresh_token(payload):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid refresh token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # A concurrent logout may have revoked it first; the outcome is the same.
+    revoked_tokens.revoke(payload, db)
+
+    access_payload = get_token_payload(token=access_token) if access_token else None
+    if access_payload and access_payload.get('id') == payload.get('id') and not _is_refresh_token(access_payload):
+        revoked_tokens.revoke(access_payload, db)
+
+    return {"message": "You have been logged out."}
+
+
+def _is_refresh_token(payload):
+    """
+    Check that a token payload belongs to a refresh token.
+
+    Refresh tokens issued before they had ids and expiry are not accepted.
+
+    Args:
+        payload (dict): Token payload, or None if the token was invalid.
+
+    Returns:
+        bool: True for a valid refresh token payload.
+    """
+    return bool(payload) and type(payload) is dict and payload.get('type') == 'refresh' and bool(payload.get('jti'))
 
 
 def _verify_user_access(user: UserModel):
@@ -111,13 +173,12 @@ def _verify_user_access(user: UserModel):
         )
 
 
-async def _get_user_token(user: UserModel, refresh_token=None):
+async def _get_user_token(user: UserModel):
     """
     Generate access and refresh tokens for the user.
 
     Args:
         user: User model.
-        refresh_token (str): Refresh token.
 
     Returns:
         TokenResponse: Access and refresh tokens.
@@ -125,9 +186,7 @@ async def _get_user_token(user: UserModel, refresh_token=None):
     payload = {"id": user.id}
     access_token_expiry = timedelta(minutes=get_settings().ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = await create_access_token(payload, access_token_expiry)
-
-    if not refresh_token:
-        refresh_token = await create_refresh_token(payload)
+    refresh_token = await create_refresh_token(payload)
 
     return TokenResponse(
         access_token=access_token,
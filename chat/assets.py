@@ -0,0 +1,221 @@
+import os
+import json
+import mmap
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from core.config import get_settings
+
+PAGE_SIZE = mmap.PAGESIZE
+
+
+def _load_checksums():
+    settings = get_settings()
+    path = settings.MODEL_CHECKSUMS or os.path.join(settings.MODEL_DIR, "checksums.json")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def sha256sum(path):
+    """
+    Compute the SHA-256 checksum of a file.
+
+    Args:
+        path (Path): Path of the file.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify(path, expected):
+    """
+    Check a file against its expected checksum.
+
+    The result is remembered in a `.verified` stamp next to the file, keyed
+    by size and modification time, so multi-GB weights are only hashed again
+    when they change.
+
+    Args:
+        path (Path): Path of the file.
+        expected (str): Expected SHA-256 hex digest.
+
+    Raises:
+        ValueError: If the file does not match the checksum.
+    """
+    stat = path.stat()
+    stamp_path = path.with_name(path.name + ".verified")
+    stamp = {"sha256": expected, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    try:
+        if json.loads(stamp_path.read_text()) == stamp:
+            return
+    except (OSError, ValueError):
+        pass
+
+    actual = sha256sum(path)
+    if actual != expected:
+        raise ValueError(f"Checksum mismatch for {path}: expected {expected}, got {actual}")
+    try:
+        stamp_path.write_text(json.dumps(stamp))
+    except OSError:
+        logging.warning(f"Could not write verification stamp for {path}")
+
+
+def prewarm(path):
+    """
+    Pull a file into the page cache so the first request does not pay for disk reads.
+
+    Args:
+        path (Path): Path of the file.
+    """
+    size = path.stat().st_size
+    if not size:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mm, "madvise"):
+            mm.madvise(mmap.MADV_WILLNEED)
+        for offset in range(0, size, PAGE_SIZE):
+            mm[offset]
+
+
+def _local_path(name):
+    return Path(get_settings().MODEL_DIR) / name
+
+
+def resolve_file(repo_id, filename):
+    """
+    Get the local path of a model file.
+
+    In offline mode the file is taken from `MODEL_DIR/<repo_id>/<filename>`,
+    must have an entry in the checksum manifest and is verified and pre-warmed;
+    the network is never used. Otherwise it is fetched through the Hugging
+    Face cache.
+
+    Args:
+        repo_id (str): Hugging Face repository.
+        filename (str): File inside the repository.
+
+    Returns:
+        str: Local path of the file.
+
+    Raises:
+        FileNotFoundError: If the file or its checksum is missing in offline mode.
+        ValueError: If the file does not match its checksum.
+    """
+    settings = get_settings()
+    if not settings.OFFLINE_MODE:
+        from huggingface_hub import hf_hub_download
+
+        return hf_hub_download(repo_id=repo_id, filename=filename)
+
+    name = f"{repo_id}/{filename}"
+    path = _local_path(name)
+    if not path.is_file():
+        raise FileNotFoundError(f"Offline mode: {path} not found. Run `python -m chat.assets fetch` on a connected machine.")
+    checksums = _load_checksums()
+    if name not in checksums:
+        raise FileNotFoundError(f"Offline mode: no checksum for {name} in the checksum manifest.")
+
+    verify(path, checksums[name])
+    if settings.PREWARM_MODELS:
+        prewarm(path)
+    return str(path)
+
+
+def resolve_model_dir(model_name):
+    """
+    Get the name or local directory to load a Hugging Face model from.
+
+    In offline mode the model is read from `MODEL_DIR/<model_name>` and every
+    file listed for it in the checksum manifest is verified. Otherwise the
+    model name is returned unchanged.
+
+    Args:
+        model_name (str): Hugging Face model id.
+
+    Returns:
+        str: The model id, or its local directory in offline mode.
+
+    Raises:
+        FileNotFoundError: If the model or its checksums are missing in offline mode.
+        ValueError: If a file does not match its checksum.
+    """
+    settings = get_settings()
+    if not settings.OFFLINE_MODE:
+        return model_name
+
+    path = _local_path(model_name)
+    if not path.is_dir():
+        raise FileNotFoundError(f"Offline mode: {path} not found. Run `python -m chat.assets fetch` on a connected machine.")
+    prefix = f"{model_name}/"
+    files = {name: digest for name, digest in _load_checksums().items() if name.startswith(prefix)}
+    if not files:
+        raise FileNotFoundError(f"Offline mode: no checksums for {model_name} in the checksum manifest.")
+
+    for name, digest in files.items():
+        verify(_local_path(name), digest)
+    return str(path)
+
+
+def fetch(repos, files):
+    """
+    Download models into `MODEL_DIR` for use in offline mode.
+
+    Args:
+        repos (list[str]): Model ids downloaded in full (embedding and reranker models).
+        files (list[tuple]): (repo_id, filename) pairs downloaded individually (GGUF weights).
+    """
+    from huggingface_hub import hf_hub_download, snapshot_download
+
+    for repo_id in repos:
+        snapshot_download(repo_id=repo_id, local_dir=_local_path(repo_id), local_dir_use_symlinks=False)
+        logging.info(f"Fetched {repo_id}")
+    for repo_id, filename in files:
+        hf_hub_download(repo_id=repo_id, filename=filename, local_dir=_local_path(repo_id), local_dir_use_symlinks=False)
+        logging.info(f"Fetched {repo_id}/{filename}")
+
+
+def write_checksums():
+    """
+    Hash every file under `MODEL_DIR` into the checksum manifest.
+
+    Returns:
+        str: Path of the manifest.
+    """
+    settings = get_settings()
+    root = Path(settings.MODEL_DIR)
+    manifest = settings.MODEL_CHECKSUMS or str(root / "checksums.json")
+    checksums = {}
+    for path in sorted(root.rglob("*")):
+        if not path.is_file() or path.suffix == ".verified" or str(path) == manifest or ".cache" in path.parts:
+            continue
+        checksums[path.relative_to(root).as_posix()] = sha256sum(path)
+    with open(manifest, "w") as f:
+        json.dump(checksums, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == "__main__":
+    from chat.llm import get_model_specs
+
+    parser = argparse.ArgumentParser(description="Manage the local model directory used in offline mode.")
+    parser.add_argument("command", choices=["fetch", "checksums"], help="fetch: download configured models into MODEL_DIR; checksums: write the checksum manifest.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    if args.command == "fetch":
+        if settings.OFFLINE_MODE:
+            raise SystemExit("Disable OFFLINE_MODE to fetch models.")
+        repos = [settings.EMBEDDING_MODEL] + ([settings.RERANK_MODEL] if settings.RERANK_ENABLED else [])
+        fetch(repos, [(spec.repo_id, spec.filename) for spec in get_model_specs().values()])
+    print(f"Checksums written to {write_checksums()}")
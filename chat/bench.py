@@ -0,0 +1,216 @@
+import sys
+import json
+import time
+import logging
+import argparse
+import resource
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from core.config import get_settings
+from chat.llm import get_model_specs, get_model_path
+from chat.inf import QA_PROMPT
+
+QUESTIONS = (
+    "What are the fundamental rights guaranteed to citizens?",
+    "How is citizenship acquired by descent?",
+    "What are the powers of the provinces in the federal structure?",
+    "Who appoints the Chief Justice and what is the term of office?",
+)
+
+
+def build_prompts(source, chunks_per_prompt):
+    """
+    Build representative QA prompts from the constitution text, using the
+    same template as chat requests.
+
+    Args:
+        source (str): PDF used for the context passages.
+        chunks_per_prompt (int): Passages stuffed into each prompt, like retrieval would.
+
+    Returns:
+        list[str]: One prompt per benchmark question.
+    """
+    settings = get_settings()
+    reader = PdfReader(source)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP)
+    text = "\n".join(page.extract_text() for page in reader.pages[:20])
+    chunks = splitter.split_text(text)
+    prompts = []
+    for i, question in enumerate(QUESTIONS):
+        start = (i * chunks_per_prompt) % max(1, len(chunks) - chunks_per_prompt)
+        context = "\n\n".join(chunks[start:start + chunks_per_prompt])
+        prompts.append(QA_PROMPT.format(history="", context=context, question=question))
+    return prompts
+
+
+def _measure(model_path, params, prompts, max_tokens):
+    """
+    Load the model with one parameter set and time the benchmark prompts.
+    Runs in a fresh process so that peak RSS belongs to this configuration only.
+
+    Args:
+        model_path (str): Path of the GGUF file.
+        params (dict): `n_threads`, `n_batch` and `n_ctx` for llama.cpp.
+        prompts (list[str]): Benchmark prompts.
+        max_tokens (int): Tokens generated per prompt.
+
+    Returns:
+        dict: Prompt and generation throughput, average prompt length, load time and peak RSS.
+    """
+    from llama_cpp import Llama
+
+    started = time.perf_counter()
+    llm = Llama(model_path=model_path, n_gpu_layers=0, use_mmap=True, verbose=False, **params)
+    load_seconds = time.perf_counter() - started
+
+    prompt_tokens = prompt_seconds = generated_tokens = generation_seconds = 0
+    for prompt in prompts:
+        tokens = llm.tokenize(prompt.encode("utf-8"))
+        if len(tokens) + max_tokens > params["n_ctx"]:
+            return {"skipped": f"prompt of {len(tokens)} tokens does not fit n_ctx={params['n_ctx']}"}
+
+        llm.reset()
+        started = time.perf_counter()
+        first_token_at = None
+        count = 0
+        for _ in llm.create_completion(prompt, max_tokens=max_tokens, temperature=0, stream=True):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            count += 1
+        finished = time.perf_counter()
+
+        prompt_tokens += len(tokens)
+        prompt_seconds += (first_token_at or finished) - started
+        generated_tokens += max(0, count - 1)
+        generation_seconds += finished - (first_token_at or finished)
+
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "prompt_tokens": prompt_tokens // len(prompts),
+        "prompt_tokens_per_second": round(prompt_tokens / prompt_seconds, 2) if prompt_seconds else 0,
+        "generation_tokens_per_second": round(generated_tokens / generation_seconds, 2) if generation_seconds else 0,
+        # ru_maxrss is reported in KiB on Linux.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def estimated_latency(result, max_tokens):
+    """
+    Estimate the latency of a typical chat request from benchmark throughput.
+
+    Args:
+        result (dict): Output of a benchmark run.
+        max_tokens (int): Typical answer length in tokens.
+
+    Returns:
+        float: Seconds for prompt evaluation plus generation, or infinity if the run failed.
+    """
+    if result.get("skipped") or not result.get("prompt_tokens_per_second") or not result.get("generation_tokens_per_second"):
+        return float("inf")
+    return result["prompt_tokens"] / result["prompt_tokens_per_second"] + max_tokens / result["generation_tokens_per_second"]
+
+
+def sweep(spec, filenames, threads, batches, contexts, prompts, max_tokens, max_rss_mb=None):
+    """
+    Benchmark every combination of quantization file, thread count, batch size and context size.
+
+    Args:
+        spec (ModelSpec): The registered model being tuned.
+        filenames (list[str]): GGUF files (quantization levels) from the model's repository.
+        threads (list[int]): Thread counts to try.
+        batches (list[int]): Batch sizes to try.
+        contexts (list[int]): Context sizes to try.
+        prompts (list[str]): Benchmark prompts.
+        max_tokens (int): Tokens generated per prompt.
+        max_rss_mb (float): Discard configurations whose peak RSS exceeds this.
+
+    Returns:
+        tuple: The best configuration (or None) and the list of all results.
+    """
+    results = []
+    best, best_latency = None, float("inf")
+    context = multiprocessing.get_context("spawn")
+    for filename, n_threads, n_batch, n_ctx in itertools.product(filenames, threads, batches, contexts):
+        config = {"filename": filename, "n_threads": n_threads, "n_batch": n_batch, "n_ctx": n_ctx}
+        model_path = get_model_path(spec.model_copy(update={"filename": filename}))
+        params = {"n_threads": n_threads, "n_batch": n_batch, "n_ctx": n_ctx}
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                result = pool.submit(_measure, model_path, params, prompts, max_tokens).result()
+            except Exception as exc:
+                result = {"skipped": str(exc)}
+
+        if max_rss_mb and result.get("peak_rss_mb", 0) > max_rss_mb:
+            result["skipped"] = f"peak RSS above {max_rss_mb} MB"
+
+        latency = estimated_latency(result, spec.max_tokens)
+        results.append({**config, **result, "estimated_latency_seconds": round(latency, 2) if latency != float("inf") else None})
+        logging.info(f"{config}: {result}")
+        if latency < best_latency:
+            best, best_latency = config, latency
+
+    return best, results
+
+
+def write_tuning(path, model, best, results):
+    """
+    Store the best configuration for a model in the tuning file read at startup.
+
+    Other models' entries in an existing file are kept.
+
+    Args:
+        path (str): Tuning file path.
+        model (str): Registry name of the model.
+        best (dict): Best configuration.
+        results (list[dict]): All benchmark results, kept for reference.
+    """
+    try:
+        with open(path) as f:
+            tuning = json.load(f)
+    except FileNotFoundError:
+        tuning = {}
+    tuning.setdefault("models", {})[model] = best
+    tuning.setdefault("results", {})[model] = results
+    with open(path, "w") as f:
+        json.dump(tuning, f, indent=2)
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    settings = get_settings()
+    cpus = multiprocessing.cpu_count()
+
+    parser = argparse.ArgumentParser(description="Find the fastest llama.cpp settings for this node.")
+    parser.add_argument("--model", default=settings.LLM_ROUTER_LARGE_MODEL, help="Registry name of the model to tune.")
+    parser.add_argument("--files", default="", help="Comma separated GGUF files (quantizations) to compare. Defaults to the registered file.")
+    parser.add_argument("--threads", type=_int_list, default=sorted({max(1, cpus // 4), max(1, cpus // 2), cpus}), help="Comma separated thread counts.")
+    parser.add_argument("--batches", type=_int_list, default=[128, 256, 512], help="Comma separated batch sizes.")
+    parser.add_argument("--contexts", type=_int_list, default=[1024, 2048], help="Comma separated context sizes.")
+    parser.add_argument("--max-tokens", type=int, default=64, help="Tokens generated per prompt.")
+    parser.add_argument("--chunks", type=int, default=settings.RETRIEVAL_K, help="Context passages per prompt.")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="Reject configurations using more memory than this.")
+    parser.add_argument("--source", default="assets/files/Constitution.pdf", help="PDF used to build the benchmark prompts.")
+    parser.add_argument("--output", default=settings.LLM_TUNING_FILE, help="Tuning file to write.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    specs = get_model_specs()
+    if args.model not in specs:
+        sys.exit(f"Unknown model {args.model!r}. Registered models: {', '.join(specs)}")
+    spec = specs[args.model]
+
+    filenames = [name for name in args.files.split(",") if name] or [spec.filename]
+    prompts = build_prompts(args.source, args.chunks)
+    best, results = sweep(spec, filenames, args.threads, args.batches, args.contexts, prompts, args.max_tokens, args.max_rss_mb)
+    if not best:
+        sys.exit("No configuration completed the benchmark.")
+
+    write_tuning(args.output, args.model, best, results)
+    print(f"Best configuration for {args.model}: {best}")
+    print(f"Written to {args.output}")
@@ -0,0 +1,82 @@
+import time
+import threading
+from langchain.callbacks.base import BaseCallbackHandler
+
+
+class GenerationCancelled(Exception):
+    """
+    Raised when a chat request is abandoned before its answer is ready.
+
+    Attributes:
+        reason (str): Why the request was cancelled, e.g. "deadline" or "disconnected".
+    """
+
+    def __init__(self, reason):
+        super().__init__(f"Generation cancelled: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Cancellation flag with an optional deadline, shared between the request
+    handler and the thread running the chat pipeline.
+    """
+
+    def __init__(self, timeout=None):
+        """
+        Args:
+            timeout (float): Seconds until the request expires. No deadline if None.
+        """
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason = None
+        self._event = threading.Event()
+
+    def cancel(self, reason="cancelled"):
+        """
+        Cancel the request.
+
+        Args:
+            reason (str): Why the request was cancelled.
+        """
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self):
+        """
+        bool: True if the request was cancelled or its deadline has passed.
+        """
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """
+        Raises:
+            GenerationCancelled: If the request was cancelled or its deadline has passed.
+        """
+        if self.cancelled:
+            raise GenerationCancelled(self.reason)
+
+
+class CancellationHandler(BaseCallbackHandler):
+    """
+    LangChain callback that aborts LlamaCpp generation mid-stream once the
+    request is cancelled, freeing the model for the next request.
+    """
+
+    raise_error = True
+
+    def __init__(self, token):
+        """
+        Args:
+            token (CancelToken): The request's cancellation token.
+        """
+        self.token = token
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.token.raise_if_cancelled()
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.token.raise_if_cancelled()
@@ -0,0 +1,72 @@
+from typing import Optional
+from pydantic import BaseModel
+from core.config import get_settings
+
+FULL = "full"
+REDUCED = "reduced"
+EXTRACTIVE = "extractive"
+
+
+class GenerationBudget(BaseModel):
+    """
+    How much work the chat pipeline may spend on one request.
+
+    Attributes:
+        level (str): Degradation level: "full", "reduced" or "extractive".
+        max_tokens (Optional[int]): Generation limit, or None for the model default.
+        k (Optional[int]): Maximum chunks passed to the LLM, or None for no extra limit.
+    """
+    level: str = FULL
+    max_tokens: Optional[int] = None
+    k: Optional[int] = None
+
+
+def select_budget(queue_depth):
+    """
+    Pick a generation budget for the current load.
+
+    Args:
+        queue_depth (int): Number of requests already waiting for the model.
+
+    Returns:
+        GenerationBudget: Full generation when the queue is short, shorter
+        answers with less context when it is deep, and an extractive answer
+        (no generation) past the extractive threshold.
+    """
+    settings = get_settings()
+    if not settings.DEGRADE_ENABLED:
+        return GenerationBudget()
+    if queue_depth >= settings.DEGRADE_EXTRACTIVE_QUEUE_DEPTH:
+        return GenerationBudget(level=EXTRACTIVE, k=settings.DEGRADE_EXTRACTIVE_K)
+    if queue_depth >= settings.DEGRADE_REDUCED_QUEUE_DEPTH:
+        return GenerationBudget(
+            level=REDUCED,
+            max_tokens=settings.DEGRADE_REDUCED_MAX_TOKENS,
+            k=settings.DEGRADE_REDUCED_K,
+        )
+    return GenerationBudget()
+
+
+def extractive_answer(docs):
+    """
+    Build an answer from the best matching passages, without generation.
+
+    Args:
+        docs (list[Document]): Retrieved chunks, best first.
+
+    Returns:
+        str: The passages, each followed by its citation.
+    """
+    if not docs:
+        return "No matching passages were found."
+
+    passages = []
+    for number, doc in enumerate(docs, start=1):
+        title = doc.metadata.get("title")
+        page = doc.metadata.get("page")
+        citation = ", ".join(
+            part for part in (title, f"page {int(page) + 1}" if page is not None else None) if part
+        )
+        text = " ".join(doc.page_content.split())
+        passages.append(f"[{number}] {text}" + (f" ({citation})" if citation else ""))
+    return "Relevant passages:\n\n" + "\n\n".join(passages)
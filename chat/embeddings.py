@@ -0,0 +1,238 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+
+def normalize_query(text):
+    """
+    Normalize a query so that trivially different spellings share a cache entry.
+
+    Args:
+        text (str): The raw query text.
+
+    Returns:
+        str: The lower-cased query with collapsed whitespace.
+    """
+    return " ".join(text.lower().split())
+
+
+class _LRUCache:
+    """
+    Thread-safe, size-bounded least recently used cache.
+    """
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a cached value and mark it as recently used.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The cached value, or None if the key is not cached.
+        """
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+        """
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+
+
+class _MicroBatcher:
+    """
+    Collect concurrent single-text requests into one batched forward pass.
+
+    Callers block in `submit` while a background thread waits up to `max_wait`
+    seconds for more requests to arrive, then embeds the whole batch at once.
+    """
+
+    def __init__(self, embed_batch, max_batch_size, max_wait):
+        self._embed_batch = embed_batch
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="query-embedder", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        """
+        Embed a single text as part of the next batch.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            list[float]: The embedding vector.
+        """
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._max_wait
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(texts, self._embed_batch(texts)))
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for text, future in batch:
+                future.set_result(vectors[text])
+
+
+class QueryEmbedder(Embeddings):
+    """
+    Sentence embedding service tuned for short, latency-sensitive queries.
+
+    Query vectors are served from an LRU cache keyed by the normalized query,
+    concurrent cache misses are micro-batched into a single forward pass, and
+    the model can run on an exported ONNX graph (optionally quantized) instead
+    of the full PyTorch stack. Document embedding bypasses the cache and is
+    batched directly.
+    """
+
+    def __init__(
+        self,
+        model_name,
+        backend="auto",
+        onnx_file="onnx/model.onnx",
+        cache_size=1024,
+        max_batch_size=16,
+        batch_wait_ms=5,
+    ):
+        """
+        Load the embedding model.
+
+        Args:
+            model_name (str): Hugging Face model id or local model directory.
+            backend (str): "onnx", "torch" or "auto" (ONNX if available, else torch).
+            onnx_file (str): ONNX file path inside the model repository, e.g. a quantized export.
+            cache_size (int): Maximum number of cached query vectors. 0 disables the cache.
+            max_batch_size (int): Maximum number of queries embedded in one forward pass.
+            batch_wait_ms (float): How long to wait for more queries before running a batch.
+        """
+        self.model_name = model_name
+        self._cache = _LRUCache(cache_size)
+
+        if backend in ("auto", "onnx"):
+            try:
+                self._load_onnx(model_name, onnx_file)
+                self.backend = "onnx"
+            except ImportError:
+                if backend == "onnx":
+                    raise
+                self._load_torch(model_name)
+                self.backend = "torch"
+        else:
+            self._load_torch(model_name)
+            self.backend = "torch"
+
+        self._batcher = _MicroBatcher(self._embed_batch, max_batch_size, batch_wait_ms / 1000)
+        logging.info(f"Query embedder ready ({self.backend}): {model_name}")
+
+    def _load_onnx(self, model_name, onnx_file):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+        try:
+            subfolder, _, file_name = onnx_file.rpartition("/")
+            self._model = ORTModelForFeatureExtraction.from_pretrained(model_name, subfolder=subfolder, file_name=file_name)
+        except (OSError, ValueError):
+            # No exported graph published for this model yet: export it on load.
+            self._model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        self._embed_batch = self._embed_onnx
+
+    def _load_torch(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name)
+        self._embed_batch = self._embed_torch
+
+    def _embed_onnx(self, texts):
+        encoded = self._tokenizer(texts, padding=True, truncation=True, return_tensors="np")
+        output = self._model(**encoded).last_hidden_state
+        # Mean pooling followed by L2 normalization, as in the sentence-transformers pipeline.
+        mask = encoded["attention_mask"][..., None].astype(output.dtype)
+        pooled = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def _embed_torch(self, texts):
+        vectors = self._model.encode(texts, normalize_embeddings=True)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        """
+        Embed a single search query.
+
+        Args:
+            text (str): The query text.
+
+        Returns:
+            list[float]: The query embedding.
+        """
+        # Only the cache key is normalized; cased models must see the query as typed,
+        # like the documents they are compared with.
+        key = normalize_query(text)
+        vector = self._cache.get(key)
+        if vector is None:
+            vector = self._batcher.submit(text)
+            self._cache.put(key, vector)
+        return vector
+
+    def embed_documents(self, texts):
+        """
+        Embed a list of documents in a single batch.
+
+        Args:
+            texts (list[str]): The document texts.
+
+        Returns:
+            list[list[float]]: The document embeddings.
+        """
+        if not texts:
+            return []
+        return self._embed_batch(list(texts))
@@ -1,95 +1,402 @@
 import os
 import logging
-from huggingface_hub import hf_hub_download
+import threading
+from contextlib import nullcontext
 import pinecone
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import HuggingFaceEmbeddings
+from starlette.concurrency import run_in_threadpool
 from langchain.vectorstores import Pinecone
-from langchain.llms import LlamaCpp
 from langchain.callbacks.manager import CallbackManager
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
 from langchain.chains.question_answering import load_qa_chain
+from core.config import get_settings
+from chat.assets import resolve_model_dir
+from chat.embeddings import QueryEmbedder
+from chat.ingest import discover_documents, ingest_corpus
+from chat.rerank import Reranker
+from chat.cancel import CancellationHandler
+from chat.degrade import EXTRACTIVE, REDUCED, GenerationBudget, extractive_answer
+from chat.llm import get_model_specs, load_llm, route_query
 
-def init():
+# The default "stuff" QA prompt with the conversation placed before the
+# retrieved context, so that a session's prompts share a cacheable prefix.
+QA_PROMPT = PromptTemplate.from_template(
+    "Use the following pieces of context to answer the question at the end. "
+    "If you don't know the answer, just say that you don't know, don't try to make up an answer.\n\n"
+    "{history}{context}\n\nQuestion: {question}\nHelpful Answer:"
+)
+
+CONDENSE_PROMPT = PromptTemplate.from_template(
+    "Given the following conversation and a follow up question, rephrase the follow up question "
+    "to be a standalone question.\n\n{history}Follow Up Question: {question}\nStandalone question:"
+)
+
+SUMMARY_PROMPT = PromptTemplate.from_template(
+    "Progressively summarize the conversation about the law, adding onto the previous summary and "
+    "keeping the details needed to answer follow-up questions.\n\n"
+    "Current summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}\n\nNew summary:"
+)
+
+def get_embeddings():
+    """
+    Create the embedding model used for both indexing and querying.
+
+    Returns:
+        QueryEmbedder: The embedding model.
+    """
+    settings = get_settings()
+    return QueryEmbedder(
+        model_name=resolve_model_dir(settings.EMBEDDING_MODEL),
+        backend=settings.EMBEDDING_BACKEND,
+        onnx_file=settings.EMBEDDING_ONNX_FILE,
+        cache_size=settings.EMBEDDING_CACHE_SIZE,
+        max_batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+        batch_wait_ms=settings.EMBEDDING_BATCH_WAIT_MS,
+    )
+
+def get_vectorstore(embeddings=None):
+    """
+    Connect to the existing Pinecone index.
+
+    Args:
+        embeddings (Embeddings): Embedding model. A new one is created if omitted.
+
+    Returns:
+        Pinecone: The vector store.
+    """
+    PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY')
+    PINECONE_API_ENV = os.environ.get('PINECONE_API_ENV', 'gcp-starter')
+    pinecone.init(api_key=PINECONE_API_KEY, environment=PINECONE_API_ENV)
+    return Pinecone.from_existing_index(get_settings().PINECONE_INDEX, embeddings or get_embeddings())
+
+def init(ingest=None):
     """
     Initialize the document search and question answering components.
 
-    This function sets up the necessary components, including document loading,
-    text splitting, embeddings, Pinecone index, LlamaCpp language model, and
-    question answering chain.
+    This function sets up the necessary components, including embeddings, the
+    Pinecone index, incremental ingestion of new or changed corpus documents,
+    registered LlamaCpp language models, and a question answering chain per model.
+
+    Args:
+        ingest (bool): Ingest new or changed documents first. Defaults to `INGEST_ON_STARTUP`.
 
     Returns:
         None
     """
-    global docsearch, chain
+    global embeddings, docsearch, chains, model_locks, reranker
 
-    # Document Loading
-    loader = PyPDFLoader("assets/files/Constitution.pdf")
-    data = loader.load()
-    
-    # Text Splitting
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=150)
-    text = text_splitter.split_documents(data)
+    settings = get_settings()
 
     # Environment Variables
     os.environ["CUDA_VISIBLE_DEVICE"] = "0"
-    PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY')
-    PINECONE_API_ENV = os.environ.get('PINECONE_API_ENV', 'gcp-starter')
 
-    # Embeddings
-    embeddings = HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
+    # Pinecone Document Search Index
+    embeddings = get_embeddings()
+    docsearch = get_vectorstore(embeddings)
 
-    # Pinecone Index
-    pinecone.init(api_key=PINECONE_API_KEY, environment=PINECONE_API_ENV)
-    index = pinecone.Index('llamaprac')
+    # Ingest documents added or changed since the last run
+    if ingest is None:
+        ingest = settings.INGEST_ON_STARTUP
+    if ingest:
+        ingest_corpus(docsearch, discover_documents(manifest=settings.CORPUS_MANIFEST))
+
+    # Reranker
+    reranker = None
+    if settings.RERANK_ENABLED:
+        reranker = Reranker(resolve_model_dir(settings.RERANK_MODEL), batch_size=settings.RERANK_BATCH_SIZE)
 
     # Callback Manager
     callback_manager = CallbackManager([StreamingStdOutCallbackHandler()])
 
-    # Language Model Initialization
-    model_name_or_path = "TheBloke/Llama-2-7b-Chat-GGUF"
-    model_basename = "llama-2-7b-chat.Q5_0.gguf"
-    model_path = hf_hub_download(repo_id=model_name_or_path, filename=model_basename)
-
-    ngpu = 40
-    n_batch = 256
-    n_ctx = 1024
-    llm = LlamaCpp(
-        model_path=model_path,
-        max_tokens=256,
-        n_gpu_layers=ngpu,
-        n_batch=n_batch,
-        callback_manager=callback_manager,
-        n_ctx=n_ctx,
+    # Language Models and Question Answering Chains
+    chains = {}
+    model_locks = {}
+    for name, spec in get_model_specs().items():
+        chains[name] = load_qa_chain(load_llm(spec, callback_manager), chain_type="stuff", prompt=QA_PROMPT)
+        # A llama.cpp context serves one generation at a time.
+        model_locks[name] = threading.Lock()
+
+    logging.info("Init complete")
+
+
+def _limit_tokens(qa_chain, max_tokens):
+    """
+    Get a copy of the QA chain whose LLM call generates at most `max_tokens`.
+
+    Args:
+        qa_chain: The question answering chain.
+        max_tokens (int): Generation limit for this call.
+
+    Returns:
+        The chain copy. The shared chain is left untouched.
+    """
+    llm_chain = qa_chain.llm_chain.copy(update={"llm_kwargs": {**qa_chain.llm_chain.llm_kwargs, "max_tokens": max_tokens}})
+    return qa_chain.copy(update={"llm_chain": llm_chain})
+
+
+def _generate(model, prompt, max_tokens, cancel=None, **inputs):
+    """
+    Run a short auxiliary prompt (condensing, summarizing) on a loaded model.
+
+    Args:
+        model (str): Registry name of the model.
+        prompt (PromptTemplate): The prompt.
+        max_tokens (int): Generation limit.
+        cancel (CancelToken): Aborts generation once cancelled.
+        **inputs: Prompt variables.
+
+    Returns:
+        str: The generated text, stripped.
+    """
+    llm_chain = LLMChain(llm=chains[model].llm_chain.llm, prompt=prompt, llm_kwargs={"max_tokens": max_tokens})
+    callbacks = [CancellationHandler(cancel)] if cancel else []
+    with model_locks[model]:
+        return llm_chain.run(callbacks=callbacks, **inputs).strip()
+
+
+def count_tokens(text):
+    """
+    Count tokens with the tokenizer of a loaded model.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: Number of tokens.
+    """
+    return chains[route_query("", chains)].llm_chain.llm.get_num_tokens(text)
+
+
+def condense_question(query, history, cancel=None):
+    """
+    Rewrite a follow-up question into a standalone question for retrieval.
+
+    Args:
+        query (str): The follow-up question.
+        history (str): Formatted conversation so far.
+        cancel (CancelToken): Aborts generation once cancelled.
+
+    Returns:
+        str: The standalone question, or the original question if condensing produced nothing.
+    """
+    model = route_query(query, chains, prefer_small=True)
+    standalone = _generate(
+        model, CONDENSE_PROMPT, get_settings().CHAT_CONDENSE_MAX_TOKENS, cancel,
+        history=history, question=query,
     )
+    return standalone.splitlines()[0] if standalone else query
 
-    # Question Answering Chain
-    chain = load_qa_chain(llm, chain_type="stuff")
 
-    # Pinecone Document Search Index
-    docsearch = Pinecone.from_texts([t.page_content for t in text], embeddings, index_name='llamaprac')
+def summarize(summary, new_lines):
+    """
+    Fold conversation lines into a rolling summary.
 
-    logging.info("Init complete")
+    Args:
+        summary (str): The current summary, possibly empty.
+        new_lines (str): Conversation lines to add.
+
+    Returns:
+        str: The new summary.
+    """
+    model = route_query("", chains, prefer_small=True)
+    return _generate(
+        model, SUMMARY_PROMPT, get_settings().CHAT_SUMMARY_MAX_TOKENS,
+        summary=summary or "(none)", new_lines=new_lines,
+    )
 
 
-def run(query):
+def standalone_question(query, history, cancel=None, budget=None):
     """
-    Execute a question answering query.
+    Turn a follow-up question into a query that retrieves well on its own.
+
+    Follow-ups like "and clause 2?" retrieve poorly by themselves. Outside
+    extractive mode the question is condensed by the small model; otherwise
+    it is prefixed with the previous user question.
 
     Args:
         query (str): The user's question.
+        history (str): Formatted conversation so far; nothing is done without one.
+        cancel (CancelToken): Aborts generation once cancelled.
+        budget (GenerationBudget): The request's generation budget.
+
+    Returns:
+        str: The query to search with.
+    """
+    if not history:
+        return query
+    if budget is not None and budget.level == EXTRACTIVE:
+        previous = [line[len("User: "):] for line in history.splitlines() if line.startswith("User: ")]
+        return f"{previous[-1]} {query}" if previous else query
+    search_query = condense_question(query, history, cancel)
+    logging.info(f"Standalone question: {search_query}")
+    return search_query
+
+
+def retrieve(search_query, collections=None, cancel=None, budget=None):
+    """
+    Find the chunks to answer from: vector search, then optional reranking.
+
+    Args:
+        search_query (str): The standalone question.
+        collections (list[str]): Restrict retrieval to these collections. Searches everything if empty.
+        cancel (CancelToken): Aborts the pipeline once cancelled.
+        budget (GenerationBudget): Limits on context. Defaults to a full answer.
+
+    Returns:
+        list[Document]: The chunks, best first.
+
+    Raises:
+        GenerationCancelled: If the request was cancelled or its deadline passed.
+    """
+    settings = get_settings()
+    budget = budget or GenerationBudget()
+    if cancel:
+        cancel.raise_if_cancelled()
+
+    search_filter = {"collection": {"$in": collections}} if collections else None
+    k = settings.RERANK_CANDIDATES if reranker else settings.RETRIEVAL_K
+    docs = docsearch.similarity_search(search_query, k=k, filter=search_filter)
+    if reranker:
+        docs = reranker.rerank(search_query, docs, settings.RERANK_TOP_N)
+    if budget.k:
+        docs = docs[:budget.k]
+    return docs
+
+
+def generate(query, docs, cancel=None, budget=None, history=""):
+    """
+    Write the answer from the retrieved chunks.
+
+    Args:
+        query (str): The user's question.
+        docs (list[Document]): Chunks returned by `retrieve`.
+        cancel (CancelToken): Aborts generation mid-stream once cancelled.
+        budget (GenerationBudget): Limits on generation. Defaults to a full answer.
+        history (str): Formatted conversation so far, for follow-up questions in a session.
 
     Returns:
         str: The response to the user's question.
+
+    Raises:
+        GenerationCancelled: If the request was cancelled or its deadline passed.
     """
-    logging.info("model 1: request received")
-    docs = docsearch.similarity_search(query)
-    response = chain.run(input_documents=docs, question=query)
-    
+    budget = budget or GenerationBudget()
+    if budget.level == EXTRACTIVE:
+        logging.info("Request processed (extractive)")
+        return extractive_answer(docs)
+
+    callbacks = []
+    if cancel:
+        cancel.raise_if_cancelled()
+        callbacks.append(CancellationHandler(cancel))
+    # Under load, prefer the small model when one is registered.
+    model = route_query(query, chains, prefer_small=budget.level == REDUCED)
+    qa_chain = chains[model]
+    if budget.max_tokens:
+        qa_chain = _limit_tokens(qa_chain, budget.max_tokens)
+    logging.info(f"Generating with model {model}")
+    with model_locks[model]:
+        response = qa_chain.run(
+            input_documents=docs,
+            question=query,
+            history=f"Conversation so far:\n{history}\n\n" if history else "",
+            callbacks=callbacks,
+        )
+
     if isinstance(response, str):
         logging.info("Request processed")
         return response
     else:
         logging.error("chain.run() did not return a string")
         return ""
+
+
+def answer_with_sources(query, collections=None, cancel=None, budget=None, history=""):
+    """
+    Execute a question answering query and keep the chunks the answer is based on.
+
+    Args:
+        query (str): The user's question.
+        collections (list[str]): Restrict retrieval to these collections. Searches everything if empty.
+        cancel (CancelToken): Aborts the pipeline between stages and generation mid-stream once cancelled.
+        budget (GenerationBudget): Limits on context and generation. Defaults to a full answer.
+        history (str): Formatted conversation so far, for follow-up questions in a session.
+
+    Returns:
+        tuple: The response to the user's question and the list of Documents passed to the model.
+
+    Raises:
+        GenerationCancelled: If the request was cancelled or its deadline passed.
+    """
+    logging.info("model 1: request received")
+    if cancel:
+        cancel.raise_if_cancelled()
+    search_query = standalone_question(query, history, cancel, budget)
+    docs = retrieve(search_query, collections, cancel, budget)
+    return generate(query, docs, cancel, budget, history), docs
+
+
+async def answer_scheduled(query, collections=None, cancel=None, budget=None, history="", slot=None):
+    """
+    Like `answer_with_sources`, but only the language model stages hold a generation slot.
+
+    Embedding, vector search and reranking run outside the slot, so retrieval
+    for other requests is not serialized behind generation (and concurrent
+    queries can share an embedding batch).
+
+    Args:
+        query (str): The user's question.
+        collections (list[str]): Restrict retrieval to these collections. Searches everything if empty.
+        cancel (CancelToken): Aborts the pipeline between stages and generation mid-stream once cancelled.
+        budget (GenerationBudget): Limits on context and generation. Defaults to a full answer.
+        history (str): Formatted conversation so far, for follow-up questions in a session.
+        slot (Callable): Returns the async context manager that holds a generation slot,
+            e.g. a bound `FairScheduler.slot`. No slot is taken if omitted.
+
+    Returns:
+        tuple: The response to the user's question and the list of Documents passed to the model.
+
+    Raises:
+        GenerationCancelled: If the request was cancelled or its deadline passed.
+    """
+    logging.info("model 1: request received")
+    budget = budget or GenerationBudget()
+    slot = slot or nullcontext
+    if cancel:
+        cancel.raise_if_cancelled()
+    # Blocking stages run in the threadpool to keep them off the event loop.
+    if history and budget.level != EXTRACTIVE:
+        async with slot():
+            search_query = await run_in_threadpool(standalone_question, query, history, cancel, budget)
+    else:
+        search_query = standalone_question(query, history, cancel, budget)
+
+    docs = await run_in_threadpool(retrieve, search_query, collections, cancel, budget)
+    if budget.level == EXTRACTIVE:
+        # Extractive answers do not use the model, so they skip its queue.
+        return generate(query, docs, cancel, budget, history), docs
+
+    async with slot():
+        response = await run_in_threadpool(generate, query, docs, cancel, budget, history)
+    return response, docs
+
+
+def run(query, collections=None, cancel=None, budget=None, history=""):
+    """
+    Execute a question answering query.
+
+    Args:
+        query (str): The user's question.
+        collections (list[str]): Restrict retrieval to these collections. Searches everything if empty.
+        cancel (CancelToken): Aborts the pipeline between stages and generation mid-stream once cancelled.
+        budget (GenerationBudget): Limits on context and generation. Defaults to a full answer.
+        history (str): Formatted conversation so far, for follow-up questions in a session.
+
+    Returns:
+        str: The response to the user's question.
+
+    Raises:
+        GenerationCancelled: If the request was cancelled or its deadline passed.
+    """
+    return answer_with_sources(query, collections, cancel, budget, history)[0]
@@ -0,0 +1,347 @@
+import json
+import hashlib
+import logging
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pypdf import PdfReader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from core.config import get_settings
+from core.database import SessionLocal
+from chat.models import DocumentModel
+
+
+def discover_documents(corpus_dir=None, manifest=None):
+    """
+    List the documents that make up the corpus.
+
+    A manifest is a JSON list of objects with a `path` and optional
+    `collection` and `title`. Without a manifest, every PDF under the corpus
+    directory is used and its first sub-directory names the collection; files
+    at the top level go to the default collection.
+
+    Args:
+        corpus_dir (str): Directory containing the PDF files.
+        manifest (str): Path to a JSON manifest. Takes precedence over `corpus_dir`.
+
+    Returns:
+        list[dict]: Documents with `source`, `collection` and `title` keys.
+    """
+    settings = get_settings()
+
+    if manifest:
+        base = Path(manifest).parent
+        with open(manifest) as f:
+            entries = json.load(f)
+        return [
+            {
+                "source": str(base / entry["path"]),
+                "collection": entry.get("collection", settings.DEFAULT_COLLECTION),
+                "title": entry.get("title", Path(entry["path"]).stem),
+            }
+            for entry in entries
+        ]
+
+    root = Path(corpus_dir or settings.CORPUS_DIR)
+    documents = []
+    for path in sorted(root.rglob("*.pdf")):
+        relative = path.relative_to(root)
+        collection = relative.parts[0] if len(relative.parts) > 1 else settings.DEFAULT_COLLECTION
+        documents.append({"source": str(path), "collection": collection, "title": path.stem})
+    return documents
+
+
+def file_checksum(path):
+    """
+    Compute the SHA-256 checksum of a file.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def vector_id(source, checksum, n):
+    """
+    Get the vector id of a document chunk.
+
+    Ids combine the source path and the content checksum, so identical files
+    at different paths (or in different collections) keep separate vectors,
+    and a new version of a file never reuses the ids of the old one.
+
+    Args:
+        source (str): Path of the source file.
+        checksum (str): SHA-256 of the file contents.
+        n (int): Position of the chunk within the document.
+
+    Returns:
+        str: The vector id.
+    """
+    return f"{hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]}-{checksum[:16]}-{n}"
+
+
+def _parse_pages(source, start, end, chunk_size, chunk_overlap):
+    """
+    Extract and split a range of PDF pages. Runs inside a worker process.
+
+    Args:
+        source (str): Path of the PDF file.
+        start (int): First page index (inclusive).
+        end (int): Last page index (exclusive).
+        chunk_size (int): Maximum characters per chunk.
+        chunk_overlap (int): Characters shared between consecutive chunks.
+
+    Returns:
+        list[tuple]: (text, page) pairs for every chunk in the range.
+    """
+    reader = PdfReader(source)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    for page in range(start, end):
+        text = reader.pages[page].extract_text()
+        chunks.extend((chunk, page) for chunk in splitter.split_text(text))
+    return chunks
+
+
+def _page_tasks(documents, pages_per_task):
+    """
+    Split documents into page ranges so that large PDFs are parsed in parallel.
+    Documents that cannot be opened are marked as failed and skipped.
+
+    Args:
+        documents (list[dict]): Documents to parse.
+        pages_per_task (int): Maximum pages handled by one worker task.
+
+    Yields:
+        tuple: (document, start, end) page ranges.
+    """
+    for document in documents:
+        try:
+            page_count = len(PdfReader(document["source"]).pages)
+        except Exception:
+            logging.exception(f"Could not read {document['source']}; skipping it")
+            document["failed"] = True
+            continue
+        document["tasks"] = max(1, -(-page_count // pages_per_task))
+        for start in range(0, max(page_count, 1), pages_per_task):
+            yield document, start, min(start + pages_per_task, page_count)
+
+
+def ingest_corpus(docsearch, documents, workers=None):
+    """
+    Ingest new or changed documents into the vector index.
+
+    Unchanged documents (same checksum as the last ingestion) are skipped, so
+    only the delta is parsed and embedded. Pages stream through
+    parse -> split -> embed -> upsert: page ranges are parsed in a process
+    pool with a bounded number of tasks in flight, and chunks are embedded and
+    upserted in fixed-size batches, so memory stays bounded regardless of
+    corpus size. Vector ids are derived from the source path and checksum
+    (see `vector_id`), which lets the chunks of a changed document be
+    replaced once its new version is fully indexed. A document that fails to parse (corrupt, encrypted) is
+    logged and skipped; its record is left untouched so it is retried on
+    the next run.
+
+    Args:
+        docsearch (Pinecone): Vector store to upsert into.
+        documents (list[dict]): Documents as returned by `discover_documents`.
+        workers (int): Number of parser processes. Defaults to `INGEST_WORKERS`.
+
+    Returns:
+        int: Number of documents ingested.
+    """
+    settings = get_settings()
+    workers = workers or settings.INGEST_WORKERS
+    max_inflight = workers * settings.INGEST_TASKS_PER_WORKER
+    db = SessionLocal()
+    try:
+        known = {doc.source: doc for doc in db.query(DocumentModel).all()}
+
+        pending = []
+        for document in documents:
+            document = dict(document, checksum=file_checksum(document["source"]), chunks=0, unflushed=0, tasks=None)
+            existing = known.get(document["source"])
+            if existing and existing.checksum == document["checksum"]:
+                continue
+            pending.append(document)
+
+        if not pending:
+            logging.info("Corpus is up to date")
+            return 0
+
+        logging.info(f"Ingesting {len(pending)} of {len(documents)} documents")
+        buffer = []
+
+        def flush(batch):
+            # A batch mixes chunks of several documents; number each within its own document.
+            offsets = {}
+            ids = []
+            for document, _, _ in batch:
+                offset = offsets.get(id(document), 0)
+                offsets[id(document)] = offset + 1
+                ids.append(vector_id(document["source"], document["checksum"], document["chunks"] + offset))
+            docsearch.add_texts(
+                [text for _, text, _ in batch],
+                metadatas=[
+                    {
+                        "source": document["source"],
+                        "title": document["title"],
+                        "collection": document["collection"],
+                        "page": page,
+                    }
+                    for document, _, page in batch
+                ],
+                ids=ids,
+                batch_size=settings.INGEST_UPSERT_BATCH_SIZE,
+                embedding_chunk_size=settings.INGEST_EMBED_BATCH_SIZE,
+            )
+            for document, _, _ in batch:
+                document["chunks"] += 1
+                document["unflushed"] -= 1
+
+        def finalize(document):
+            existing = known.get(document["source"])
+            if existing and existing.chunk_count:
+                docsearch.delete(ids=[vector_id(existing.source, existing.checksum, i) for i in range(existing.chunk_count)])
+            if not existing:
+                existing = known[document["source"]] = DocumentModel(source=document["source"])
+                db.add(existing)
+            existing.title = document["title"]
+            existing.collection = document["collection"]
+            existing.checksum = document["checksum"]
+            existing.chunk_count = document["chunks"]
+            db.commit()
+            document["done"] = True
+            logging.info(f"Ingested {document['source']} ({document['chunks']} chunks)")
+
+        def fail(document):
+            document["failed"] = True
+            buffer[:] = [item for item in buffer if item[0] is not document]
+            # Remove what was already upserted under the new checksum.
+            if document["chunks"]:
+                docsearch.delete(ids=[vector_id(document["source"], document["checksum"], i) for i in range(document["chunks"])])
+
+        def drain(force=False):
+            size = settings.INGEST_EMBED_BATCH_SIZE
+            while len(buffer) >= size or (force and buffer):
+                flush(buffer[:size])
+                del buffer[:size]
+            for document in pending:
+                if document["tasks"] == 0 and document["unflushed"] == 0 and not document.get("done") and not document.get("failed"):
+                    finalize(document)
+
+        def collect(futures):
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                document = futures.pop(future)
+                document["tasks"] -= 1
+                if document.get("failed"):
+                    continue
+                try:
+                    chunks = future.result()
+                except Exception:
+                    logging.exception(f"Could not parse {document['source']}; skipping it")
+                    fail(document)
+                    continue
+                document["unflushed"] += len(chunks)
+                buffer.extend((document, text, page) for text, page in chunks)
+            drain()
+
+        # Spawn rather than fork: by now the app has started embedder, ONNX
+        # Runtime and Pinecone threads whose locks a forked child could inherit held.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {}
+            for document, start, end in _page_tasks(pending, settings.INGEST_PAGES_PER_TASK):
+                while len(futures) >= max_inflight:
+                    collect(futures)
+                future = pool.submit(_parse_pages, document["source"], start, end, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+                futures[future] = document
+            while futures:
+                collect(futures)
+        drain(force=True)
+
+        return sum(1 for document in pending if document.get("done"))
+    finally:
+        db.close()
+
+
+def reset_index(docsearch):
+    """
+    Delete every vector in the index and forget all ingested documents.
+
+    Needed once for indexes filled by earlier versions, which added the
+    constitution on every start with random ids and no collection metadata;
+    those vectors are never replaced by incremental ingestion.
+
+    Args:
+        docsearch (Pinecone): Vector store to clear.
+    """
+    docsearch.delete(delete_all=True)
+    db = SessionLocal()
+    try:
+        db.query(DocumentModel).delete()
+        db.commit()
+    finally:
+        db.close()
+    logging.info("Search index cleared")
+
+
+def list_collections():
+    """
+    List the collections available for search.
+
+    Returns:
+        list[str]: Collection names.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(DocumentModel.collection).distinct().all()
+        return sorted(row[0] for row in rows)
+    finally:
+        db.close()
+
+
+def index_version():
+    """
+    Identify the current contents of the search index.
+
+    Returns:
+        str: SHA-256 over the source and checksum of every ingested document;
+        it changes whenever a document is added, changed or re-ingested.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(DocumentModel.source, DocumentModel.checksum).order_by(DocumentModel.source).all()
+    finally:
+        db.close()
+    digest = hashlib.sha256()
+    for source, checksum in rows:
+        digest.update(f"{source}\0{checksum}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    from chat.inf import get_vectorstore
+
+    parser = argparse.ArgumentParser(description="Ingest documents into the search index.")
+    parser.add_argument("--dir", dest="corpus_dir", help="Directory of PDF files to ingest.")
+    parser.add_argument("--manifest", help="JSON manifest of documents to ingest.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of parser processes.")
+    parser.add_argument("--reset", action="store_true", help="Delete all vectors and re-ingest everything.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    docsearch = get_vectorstore()
+    if args.reset:
+        reset_index(docsearch)
+    documents = discover_documents(corpus_dir=args.corpus_dir, manifest=args.manifest)
+    count = ingest_corpus(docsearch, documents, workers=args.workers)
+    print(f"Ingested {count} documents.")
@@ -0,0 +1,254 @@
+import uuid
+import asyncio
+import logging
+from functools import partial
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from starlette.concurrency import run_in_threadpool
+from core.config import get_settings
+from core.database import SessionLocal
+from chat.models import ChatJobModel, ChatSessionModel
+from chat.inf import answer_scheduled
+from chat.cancel import CancelToken
+from chat.scheduler import get_tier, scheduler
+from chat.sessions import answer_in_session, compact_session
+from users.models import UserModel
+
+FINISHED = ("completed", "failed")
+
+
+class ChatJobQueue:
+    """
+    In-process queue that answers persisted chat jobs at a steady rate.
+
+    Jobs are stored in the database before they are queued, so they survive
+    worker restarts: on startup, queued jobs are picked up again. Each process
+    refreshes a heartbeat on the jobs it is answering and periodically
+    re-queues running jobs whose heartbeat went stale, i.e. whose process
+    died. A job is claimed with a conditional update, so several app
+    processes can share the table without answering a job twice.
+    """
+
+    def __init__(self):
+        self._queue = asyncio.Queue()
+        self._events = {}
+        self._workers = []
+        self._running = set()
+
+    async def start(self, workers):
+        """
+        Re-queue unfinished jobs and start the worker tasks.
+
+        Args:
+            workers (int): Number of jobs processed concurrently.
+        """
+        db = SessionLocal()
+        try:
+            self._reap(db)
+            job_ids = [row[0] for row in db.query(ChatJobModel.id).filter(ChatJobModel.status == "queued").order_by(ChatJobModel.created_at)]
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            self._queue.put_nowait(job_id)
+        if job_ids:
+            logging.info(f"Re-queued {len(job_ids)} chat jobs")
+
+        self._workers = [asyncio.create_task(self._work()) for _ in range(workers)]
+        self._workers.append(asyncio.create_task(self._maintain()))
+
+    def _reap(self, db):
+        """
+        Re-queue running jobs whose worker stopped sending heartbeats.
+
+        Args:
+            db: Database session.
+
+        Returns:
+            list[str]: Ids of the re-queued jobs.
+        """
+        stale_before = datetime.now() - timedelta(seconds=get_settings().CHAT_JOB_STALE_SECONDS)
+        stale = (
+            ChatJobModel.status == "running",
+            or_(ChatJobModel.heartbeat_at.is_(None), ChatJobModel.heartbeat_at < stale_before),
+        )
+        job_ids = [row[0] for row in db.query(ChatJobModel.id).filter(*stale)]
+        if job_ids:
+            db.query(ChatJobModel).filter(ChatJobModel.id.in_(job_ids), *stale).update(
+                {"status": "queued", "started_at": None, "heartbeat_at": None},
+                synchronize_session=False,
+            )
+        db.commit()
+        return job_ids
+
+    def _beat(self):
+        db = SessionLocal()
+        try:
+            if self._running:
+                db.query(ChatJobModel).filter(
+                    ChatJobModel.id.in_(list(self._running)),
+                    ChatJobModel.status == "running",
+                ).update({"heartbeat_at": datetime.now()}, synchronize_session=False)
+                db.commit()
+            return self._reap(db)
+        finally:
+            db.close()
+
+    async def _maintain(self):
+        """
+        Keep this process's running jobs alive and pick up orphaned ones.
+        """
+        while True:
+            await asyncio.sleep(get_settings().CHAT_JOB_HEARTBEAT_SECONDS)
+            try:
+                job_ids = await run_in_threadpool(self._beat)
+            except Exception:
+                logging.exception("Chat job heartbeat failed")
+                continue
+            for job_id in job_ids:
+                self._queue.put_nowait(job_id)
+            if job_ids:
+                logging.warning(f"Re-queued {len(job_ids)} orphaned chat jobs")
+
+    async def stop(self):
+        """
+        Cancel the worker tasks. Unfinished jobs stay in the database.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, db, user_id, query, collections=None, session_id=None):
+        """
+        Persist a new job and queue it.
+
+        Args:
+            db: Database session.
+            user_id (int): Owner of the job.
+            query (str): The user's question.
+            collections (list[str]): Collections to restrict the search to.
+            session_id (str): Chat session the question belongs to.
+
+        Returns:
+            ChatJobModel: The queued job.
+        """
+        job = ChatJobModel(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            query=query,
+            collections=collections,
+            session_id=session_id,
+            status="queued",
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def wait(self, db, job, timeout):
+        """
+        Wait until a job finishes or the timeout expires.
+
+        Jobs answered by this process wake the waiter immediately; jobs
+        answered by another process are noticed by re-reading the row.
+
+        Args:
+            db: Database session.
+            job (ChatJobModel): The job to wait for.
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            ChatJobModel: The job, refreshed from the database.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        event = self._events.setdefault(job.id, asyncio.Event())
+        try:
+            while True:
+                # End the request's transaction first: under REPEATABLE READ a
+                # re-read inside it would keep returning the old snapshot.
+                db.rollback()
+                db.refresh(job)
+                remaining = deadline - loop.time()
+                if job.status in FINISHED or remaining <= 0:
+                    break
+                if event.is_set():
+                    # Already woken once; poll instead of spinning on the set event.
+                    await asyncio.sleep(min(remaining, 1))
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(remaining, 1))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if job.status in FINISHED:
+                self._events.pop(job.id, None)
+        return job
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+            except Exception:
+                logging.exception(f"Chat job {job_id} crashed")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job_id):
+        db = SessionLocal()
+        try:
+            claimed = db.query(ChatJobModel).filter(
+                ChatJobModel.id == job_id,
+                ChatJobModel.status == "queued",
+            ).update({"status": "running", "started_at": datetime.now(), "heartbeat_at": datetime.now()})
+            db.commit()
+            if not claimed:
+                return
+            self._running.add(job_id)
+
+            job = db.query(ChatJobModel).filter(ChatJobModel.id == job_id).first()
+            user = db.query(UserModel).filter(UserModel.id == job.user_id).first()
+            cancel = CancelToken(timeout=get_settings().CHAT_JOB_DEADLINE_SECONDS)
+            try:
+                # Jobs share the fair queue with synchronous requests; their
+                # admission was already checked when they were submitted.
+                slot = partial(scheduler.slot, job.user_id, weight=get_tier(user)["weight"], cancel=cancel, limit_queue=False)
+                if job.session_id:
+                    session = db.query(ChatSessionModel).filter(ChatSessionModel.id == job.session_id).first()
+                    job.answer = await answer_in_session(db, session, job.query, job.collections, cancel, slot=slot)
+                else:
+                    job.answer, _ = await answer_scheduled(job.query, job.collections, cancel, slot=slot)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                # Shutting down: stop generating and leave the job for the next start.
+                cancel.cancel("shutdown")
+                job.status = "queued"
+                job.started_at = None
+                job.heartbeat_at = None
+                db.commit()
+                raise
+            except Exception as exc:
+                logging.exception(f"Chat job {job_id} failed")
+                job.status = "failed"
+                job.error = str(exc)[:500]
+            job.finished_at = datetime.now()
+            db.commit()
+            self._notify(job_id)
+            if job.session_id and job.status == "completed":
+                # Outside the generation slot, after waiters have their answer.
+                await compact_session(job.session_id)
+        finally:
+            self._running.discard(job_id)
+            db.close()
+            self._notify(job_id)
+
+    def _notify(self, job_id):
+        event = self._events.get(job_id)
+        if event:
+            event.set()
+
+
+job_queue = ChatJobQueue()
@@ -0,0 +1,171 @@
+import json
+import logging
+from typing import Optional
+from pydantic import BaseModel
+from langchain.llms import LlamaCpp
+from core.config import get_settings
+from chat.assets import resolve_file
+
+# Phrases that usually call for reasoning over several provisions.
+COMPLEX_MARKERS = (
+    "compare", "comparison", "difference", "differ", "versus", " vs ", "explain",
+    "why", "how does", "how do", "analy", "implication", "relationship", "conflict",
+)
+
+
+class ModelSpec(BaseModel):
+    """
+    A GGUF model registered for chat generation.
+
+    Attributes:
+        name (str): Registry name, e.g. "small" or "large".
+        repo_id (str): Hugging Face repository holding the GGUF file.
+        filename (str): GGUF file name inside the repository.
+        n_ctx (int): Context window in tokens.
+        n_batch (int): Prompt tokens evaluated per batch.
+        n_threads (Optional[int]): CPU threads. None lets llama.cpp decide.
+        n_gpu_layers (int): Layers offloaded to the GPU. 0 on CPU-only nodes.
+        use_mmap (bool): Memory-map the model file instead of reading it into memory.
+        use_mlock (bool): Lock the model in RAM so it is never paged out.
+        max_tokens (int): Default generation limit.
+    """
+    name: str
+    repo_id: str
+    filename: str
+    n_ctx: int
+    n_batch: int
+    n_threads: Optional[int] = None
+    n_gpu_layers: int = 0
+    use_mmap: bool = True
+    use_mlock: bool = False
+    max_tokens: int = 256
+
+
+def load_tuning(path):
+    """
+    Read per-model settings written by the `chat.bench` tuning command.
+
+    Args:
+        path (str): Tuning file path.
+
+    Returns:
+        dict[str, dict]: Tuned parameters by model name; empty if there is no tuning file.
+    """
+    if not path:
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f).get("models", {})
+    except FileNotFoundError:
+        return {}
+
+
+def get_model_specs():
+    """
+    Get the registered models.
+
+    Unset parameters are taken from the global LLM settings, and parameters
+    found by `python -m chat.bench` for this node override both.
+
+    Returns:
+        dict[str, ModelSpec]: Model specs by registry name.
+    """
+    settings = get_settings()
+    tuning = load_tuning(settings.LLM_TUNING_FILE)
+    defaults = {
+        "n_ctx": settings.LLM_N_CTX,
+        "n_batch": settings.LLM_N_BATCH,
+        "n_threads": settings.LLM_N_THREADS,
+        "n_gpu_layers": settings.LLM_N_GPU_LAYERS,
+        "use_mmap": settings.LLM_USE_MMAP,
+        "use_mlock": settings.LLM_USE_MLOCK,
+        "max_tokens": settings.LLM_MAX_TOKENS,
+    }
+    return {
+        name: ModelSpec(**{**defaults, **config, **tuning.get(name, {}), "name": name})
+        for name, config in settings.LLM_MODELS.items()
+    }
+
+
+def get_model_path(spec):
+    """
+    Get the local path of a model's GGUF file, downloading it if needed.
+    In offline mode it is read from `MODEL_DIR` and verified instead.
+
+    Args:
+        spec (ModelSpec): The model.
+
+    Returns:
+        str: Path of the GGUF file.
+    """
+    return resolve_file(spec.repo_id, spec.filename)
+
+
+def load_llm(spec, callback_manager=None):
+    """
+    Load a registered model with its CPU settings.
+
+    Args:
+        spec (ModelSpec): The model.
+        callback_manager (CallbackManager): Callbacks attached to every generation.
+
+    Returns:
+        LlamaCpp: The loaded model.
+    """
+    llm = LlamaCpp(
+        model_path=get_model_path(spec),
+        max_tokens=spec.max_tokens,
+        n_ctx=spec.n_ctx,
+        n_batch=spec.n_batch,
+        n_threads=spec.n_threads,
+        n_gpu_layers=spec.n_gpu_layers,
+        use_mmap=spec.use_mmap,
+        use_mlock=spec.use_mlock,
+        callback_manager=callback_manager,
+    )
+    kv_cache_mb = get_settings().LLM_KV_CACHE_MB
+    if kv_cache_mb:
+        from llama_cpp import LlamaRAMCache
+
+        # Keeps evaluated prompt states so the next turn of a session only
+        # evaluates the tokens after the shared prefix (instructions + history).
+        llm.client.set_cache(LlamaRAMCache(capacity_bytes=kv_cache_mb * 1024 * 1024))
+    logging.info(f"Loaded model {spec.name}: {spec.repo_id}/{spec.filename}")
+    return llm
+
+
+def route_query(query, available, prefer_small=False):
+    """
+    Pick the model for a question.
+
+    Short, simple questions go to the small model; long questions, several
+    questions at once, or ones asking for comparison or explanation go to
+    the large model. Without a registered small model everything goes to
+    the large one.
+
+    Args:
+        query (str): The user's question.
+        available (Iterable[str]): Names of the loaded models.
+        prefer_small (bool): Use the small model regardless of the question, e.g. under heavy load.
+
+    Returns:
+        str: Registry name of the model to use.
+    """
+    settings = get_settings()
+    available = list(available)
+    small, large = settings.LLM_ROUTER_SMALL_MODEL, settings.LLM_ROUTER_LARGE_MODEL
+    if large not in available:
+        large = available[-1]
+    if not settings.LLM_ROUTER_ENABLED or small not in available:
+        return large
+    if prefer_small:
+        return small
+
+    lowered = f" {query.lower()} "
+    if (
+        len(query.split()) > settings.LLM_ROUTER_MAX_WORDS
+        or query.count("?") > 1
+        or any(marker in lowered for marker in COMPLEX_MARKERS)
+    ):
+        return large
+    return small
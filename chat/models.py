@@ -0,0 +1,127 @@
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, UniqueConstraint, func
+
+from core.database import Base
+
+class DocumentModel(Base):
+    """
+    Document model for tracking files ingested into the search index.
+
+    Attributes:
+        id (int): Primary key for the document.
+        source (str): Path of the source file.
+        title (str): Human readable title of the document.
+        collection (str): Collection (namespace) the document belongs to.
+        checksum (str): SHA-256 of the file contents, used to skip unchanged files.
+        chunk_count (int): Number of chunks upserted into the index.
+        ingested_at (DateTime): Date and time when the document was last ingested.
+    """
+    __tablename__ = "documents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(500), unique=True, index=True)
+    title = Column(String(255))
+    collection = Column(String(100), index=True)
+    checksum = Column(String(64), index=True)
+    chunk_count = Column(Integer, default=0)
+    ingested_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+class ChatJobModel(Base):
+    """
+    Chat job model for questions answered asynchronously.
+
+    Attributes:
+        id (str): Public job id (UUID4).
+        user_id (int): Owner of the job.
+        query (str): The user's question.
+        collections (list[str]): Collections the search is restricted to.
+        session_id (str): Chat session the question belongs to, if any.
+        status (str): One of "queued", "running", "completed" or "failed".
+        answer (str): Generated answer once completed.
+        error (str): Failure reason if the job failed.
+        created_at (DateTime): Date and time when the job was submitted.
+        started_at (DateTime): Date and time when generation started.
+        heartbeat_at (DateTime): Last time the worker answering the job reported it alive.
+        finished_at (DateTime): Date and time when the job completed or failed.
+    """
+    __tablename__ = "chat_jobs"
+
+    id = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    query = Column(Text, nullable=False)
+    collections = Column(JSON, nullable=True)
+    session_id = Column(String(36), ForeignKey("chat_sessions.id"), nullable=True, index=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    answer = Column(Text, nullable=True)
+    error = Column(String(500), nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    started_at = Column(DateTime, nullable=True, default=None)
+    heartbeat_at = Column(DateTime, nullable=True, default=None, index=True)
+    finished_at = Column(DateTime, nullable=True, default=None)
+
+class ChatSessionModel(Base):
+    """
+    Chat session model for multi-turn conversations.
+
+    Attributes:
+        id (str): Public session id (UUID4).
+        user_id (int): Owner of the session.
+        summary (str): Rolling summary of the turns that were compacted out of the history.
+        summarized_until (int): Id of the last message folded into the summary.
+        created_at (DateTime): Date and time when the session was created.
+        updated_at (DateTime): Date and time of the last turn.
+    """
+    __tablename__ = "chat_sessions"
+
+    id = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    summary = Column(Text, nullable=True)
+    summarized_until = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(DateTime, nullable=True, default=None, onupdate=func.now())
+
+class ChatMessageModel(Base):
+    """
+    Chat message model for the turns of a chat session.
+
+    Attributes:
+        id (int): Primary key for the message; orders the conversation.
+        session_id (str): Session the message belongs to.
+        role (str): "user" or "assistant".
+        content (str): The message text.
+        created_at (DateTime): Date and time when the message was stored.
+    """
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(36), ForeignKey("chat_sessions.id"), index=True)
+    role = Column(String(10), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+class PrecomputedAnswerModel(Base):
+    """
+    Precomputed answer model for frequently asked questions.
+
+    Attributes:
+        id (int): Primary key for the answer.
+        question (str): The canonical question.
+        normalized_question (str): Lower-cased question with collapsed whitespace, for exact matches.
+        collections (list[str]): Collections the search was restricted to, or None for all.
+        collection_key (str): Sorted, comma separated `collections` ("" for all); one answer per question and key.
+        answer (str): The generated answer.
+        sources (list[dict]): The chunks passed to the model, with their metadata.
+        index_version (str): Version of the search index the answer was generated from.
+        created_at (DateTime): Date and time when the answer was generated.
+    """
+    __tablename__ = "precomputed_answers"
+    __table_args__ = (UniqueConstraint("normalized_question", "collection_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    question = Column(Text, nullable=False)
+    normalized_question = Column(String(500), index=True)
+    collections = Column(JSON, nullable=True)
+    collection_key = Column(String(200), nullable=False, default="")
+    answer = Column(Text, nullable=False)
+    sources = Column(JSON, nullable=True)
+    index_version = Column(String(64), index=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,194 @@
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from core.config import get_settings
+from core.database import SessionLocal
+from chat import inf
+from chat.models import PrecomputedAnswerModel
+from chat.embeddings import normalize_query
+from chat.ingest import index_version
+
+
+def _sources(docs):
+    return [{**doc.metadata, "text": doc.page_content} for doc in docs]
+
+
+def collection_key(collections):
+    """
+    Get the canonical key of a collection filter.
+
+    Args:
+        collections (list[str]): Collections to restrict the search to, or None for all.
+
+    Returns:
+        str: Sorted, comma separated collection names; empty for all collections.
+    """
+    return ",".join(sorted(set(collections or [])))
+
+
+def precompute(questions, collections=None, workers=None):
+    """
+    Answer canonical questions ahead of time and store the answers.
+
+    Questions are answered concurrently: retrieval and reranking overlap,
+    while each loaded model still generates one answer at a time. Existing
+    answers to the same questions for the same collections are replaced.
+
+    Args:
+        questions (list[str]): The canonical questions.
+        collections (list[str]): Restrict retrieval to these collections.
+        workers (int): Questions answered concurrently. Defaults to `PRECOMPUTED_WORKERS`.
+
+    Returns:
+        int: Number of answers stored.
+    """
+    workers = workers or get_settings().PRECOMPUTED_WORKERS
+    version = index_version()
+    key = collection_key(collections)
+    questions = list(dict.fromkeys(question.strip() for question in questions if question.strip()))
+    stored = 0
+    db = SessionLocal()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(inf.answer_with_sources, question, collections): question for question in questions}
+            for future in as_completed(futures):
+                question = futures[future]
+                try:
+                    answer, docs = future.result()
+                except Exception:
+                    logging.exception(f"Could not answer {question!r}")
+                    continue
+                if not answer:
+                    continue
+
+                normalized = normalize_query(question)
+                row = db.query(PrecomputedAnswerModel).filter(
+                    PrecomputedAnswerModel.normalized_question == normalized,
+                    PrecomputedAnswerModel.collection_key == key,
+                ).first()
+                if not row:
+                    row = PrecomputedAnswerModel(normalized_question=normalized, collection_key=key)
+                    db.add(row)
+                row.question = question
+                row.collections = collections or None
+                row.answer = answer
+                row.sources = _sources(docs)
+                row.index_version = version
+                db.commit()
+                stored += 1
+                logging.info(f"Stored answer {stored}/{len(questions)}: {question}")
+        return stored
+    finally:
+        db.close()
+
+
+class AnswerStore:
+    """
+    In-memory view of the precomputed answers for the current index version.
+
+    Questions match a precomputed one exactly after normalization, or by
+    cosine similarity of their embeddings. The query embedding is cached by
+    the embedder, so a miss costs nothing extra for the retrieval that follows.
+    Answers generated from an older version of the index are never served.
+    """
+
+    def __init__(self, threshold, refresh_seconds):
+        """
+        Args:
+            threshold (float): Minimum cosine similarity for a match.
+            refresh_seconds (int): How often to reload the answers from the database.
+        """
+        self._threshold = threshold
+        self._refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._signature = None
+        self._entries = []
+        self._exact = {}
+        self._keys = None
+        self._vectors = None
+
+    def refresh(self):
+        """
+        Reload the answers for the current index version.
+
+        Question embeddings are only recomputed when the set of answers changed.
+        """
+        version = index_version()
+        db = SessionLocal()
+        try:
+            rows = db.query(PrecomputedAnswerModel).filter(PrecomputedAnswerModel.index_version == version).order_by(PrecomputedAnswerModel.id).all()
+            db.expunge_all()
+        finally:
+            db.close()
+
+        signature = (version, tuple((row.id, row.created_at) for row in rows))
+        if signature != self._signature:
+            vectors = None
+            if rows:
+                vectors = np.array(inf.embeddings.embed_documents([row.normalized_question for row in rows]), dtype=np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            self._entries, self._vectors = rows, vectors
+            self._exact = {(row.normalized_question, row.collection_key): row for row in rows}
+            self._keys = np.array([row.collection_key for row in rows], dtype=object)
+            self._signature = signature
+            logging.info(f"Loaded {len(rows)} precomputed answers")
+        self._loaded_at = time.monotonic()
+
+    def lookup(self, query, collections=None):
+        """
+        Find the precomputed answer for a question.
+
+        Args:
+            query (str): The user's question.
+            collections (list[str]): Collections the user restricted the search to.
+
+        Returns:
+            PrecomputedAnswerModel: The matching answer, or None.
+        """
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self._refresh_seconds:
+                self.refresh()
+            entries, exact, keys, vectors = self._entries, self._exact, self._keys, self._vectors
+        if not entries:
+            return None
+
+        key = collection_key(collections)
+        entry = exact.get((normalize_query(query), key))
+        if entry is not None:
+            return entry
+
+        # Only answers generated for the same collections are candidates.
+        candidates = np.flatnonzero(keys == key)
+        if not len(candidates):
+            return None
+        vector = np.array(inf.embeddings.embed_query(query), dtype=np.float32)
+        scores = vectors[candidates] @ (vector / np.linalg.norm(vector))
+        best = int(np.argmax(scores))
+        if scores[best] < self._threshold:
+            return None
+        return entries[candidates[best]]
+
+
+settings = get_settings()
+
+answer_store = AnswerStore(threshold=settings.PRECOMPUTED_MATCH_THRESHOLD, refresh_seconds=settings.PRECOMPUTED_REFRESH_SECONDS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute answers to frequently asked questions.")
+    parser.add_argument("questions", help="Text file with one canonical question per line.")
+    parser.add_argument("--collections", default="", help="Comma separated collections to restrict the search to.")
+    parser.add_argument("--workers", type=int, default=None, help="Questions answered concurrently.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.questions) as f:
+        questions = [line for line in f if line.strip() and not line.lstrip().startswith("#")]
+    inf.init(ingest=False)
+    count = precompute(questions, [name for name in args.collections.split(",") if name], workers=args.workers)
+    print(f"Stored {count} precomputed answers.")
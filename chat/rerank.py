@@ -0,0 +1,49 @@
+import logging
+
+
+class Reranker:
+    """
+    Cross-encoder reranker for retrieved chunks.
+
+    Vector search is cheap but imprecise, so a wider candidate set is
+    retrieved first and each (query, chunk) pair is then scored jointly by a
+    small cross-encoder. Only the best few chunks are passed to the LLM,
+    which keeps the prompt short.
+    """
+
+    def __init__(self, model_name, batch_size=32):
+        """
+        Load the cross-encoder.
+
+        Args:
+            model_name (str): Hugging Face model id or local model directory.
+            batch_size (int): Number of pairs scored per forward pass.
+        """
+        # Imported here so that torch is only loaded when reranking is enabled.
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name)
+        self.batch_size = batch_size
+        logging.info(f"Reranker ready: {model_name}")
+
+    def rerank(self, query, docs, top_n):
+        """
+        Order documents by relevance to the query and keep the best ones.
+
+        Args:
+            query (str): The user's question.
+            docs (list[Document]): Candidate documents from vector search.
+            top_n (int): Number of documents to keep.
+
+        Returns:
+            list[Document]: The `top_n` most relevant documents, best first.
+        """
+        if len(docs) <= 1:
+            return docs
+        scores = self.model.predict(
+            [(query, doc.page_content) for doc in docs],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        ranked = sorted(zip(scores, range(len(docs))), reverse=True)
+        return [docs[i] for _, i in ranked[:top_n]]
@@ -0,0 +1,65 @@
+from pydantic import BaseModel
+from typing import List, Union
+from datetime import datetime
+
+class BaseResponse(BaseModel):
+    """
+    Base class for response Pydantic models.
+    """
+    class Config:
+        from_attributes = True
+        arbitrary_types_allowed = True
+
+
+class ChatJobResponse(BaseResponse):
+    """
+    Pydantic model for chat job response.
+
+    Attributes:
+        id (str): Job ID.
+        status (str): Job status: queued, running, completed or failed.
+        query (str): The submitted question.
+        collections (Union[None, List[str]]): Collections the search is restricted to.
+        session_id (Union[None, str]): Chat session the question belongs to.
+        answer (Union[None, str]): Generated answer once completed.
+        error (Union[None, str]): Failure reason if the job failed.
+        created_at (datetime): Date and time when the job was submitted.
+        finished_at (Union[None, datetime]): Date and time when the job finished.
+    """
+    id: str
+    status: str
+    query: str
+    collections: Union[None, List[str]] = None
+    session_id: Union[None, str] = None
+    answer: Union[None, str] = None
+    error: Union[None, str] = None
+    created_at: datetime
+    finished_at: Union[None, datetime] = None
+
+
+class ChatMessageResponse(BaseResponse):
+    """
+    Pydantic model for chat message response.
+
+    Attributes:
+        role (str): "user" or "assistant".
+        content (str): The message text.
+        created_at (datetime): Date and time when the message was stored.
+    """
+    role: str
+    content: str
+    created_at: datetime
+
+
+class ChatSessionResponse(BaseResponse):
+    """
+    Pydantic model for chat session response.
+
+    Attributes:
+        id (str): Session ID.
+        created_at (datetime): Date and time when the session was created.
+        messages (List[ChatMessageResponse]): The conversation so far.
+    """
+    id: str
+    created_at: datetime
+    messages: List[ChatMessageResponse] = []
@@ -1,8 +1,24 @@
-from fastapi import APIRouter, Depends, status, Form
-from fastapi.responses import JSONResponse
+import asyncio
+from functools import partial
+from fastapi import APIRouter, BackgroundTasks, Depends, status, Form, Request, Query
+from fastapi.exceptions import HTTPException
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from core.config import get_settings
+from core.database import get_db
 from core.security import oauth2_scheme
 from chat.schemas import ChatRequest
-from chat.inf import run
+from chat.inf import answer_scheduled
+from chat.cancel import CancelToken, GenerationCancelled
+from chat.degrade import FULL, select_budget
+from chat.ingest import list_collections
+from chat.precompute import answer_store
+from chat.jobs import job_queue
+from chat.models import ChatJobModel
+from chat.responses import ChatJobResponse, ChatMessageResponse, ChatSessionResponse
+from chat.sessions import answer_in_session, compact_session, create_session, get_messages, get_session
+from chat.scheduler import get_tier, rate_limiter, scheduler
 
 router = APIRouter(
     prefix="/chat",
@@ -11,17 +27,204 @@ router = APIRouter(
     dependencies=[Depends(oauth2_scheme)]
 )
 
+def _get_user(request: Request):
+    """
+    Get the authenticated user.
+
+    Args:
+        request (Request): The HTTP request.
+
+    Returns:
+        UserModel: The authenticated user.
+
+    Raises:
+        HTTPException: If the request is not authenticated.
+    """
+    if not getattr(request.user, "id", None):
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return request.user
+
+def _admit(user):
+    """
+    Apply the user's chat rate limit.
+
+    Args:
+        user (UserModel): The authenticated user.
+
+    Returns:
+        dict: The user's tier settings.
+
+    Raises:
+        HTTPException: If the user has exhausted their rate limit.
+    """
+    tier = get_tier(user)
+    if get_settings().RATE_LIMIT_ENABLED:
+        rate_limiter.check(user.id, tier)
+    return tier
+
+async def _cancel_on_disconnect(request: Request, cancel: CancelToken):
+    """
+    Cancel the request's generation as soon as the client goes away.
+
+    Args:
+        request (Request): The HTTP request.
+        cancel (CancelToken): The request's cancellation token.
+    """
+    while not cancel.cancelled:
+        if await request.is_disconnected():
+            cancel.cancel("disconnected")
+            return
+        await asyncio.sleep(0.5)
+
 @router.post('', status_code=status.HTTP_201_CREATED)
-async def chat_respond(data: ChatRequest):
+async def chat_respond(data: ChatRequest, request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Respond to a chat request.
 
+    Generation is aborted if the client disconnects or the request exceeds
+    `CHAT_DEADLINE_SECONDS`, so abandoned requests do not hold the model.
+    Requests are rate limited per user and wait for the model in a fair,
+    per-user queue. When that queue is deep, answers are shortened or
+    replaced by the best matching passages; the `X-Degradation-Level`
+    header reports which ("full", "reduced" or "extractive"). Frequently
+    asked questions are served from answers precomputed by
+    `python -m chat.precompute`, marked with `X-Answer-Source: precomputed`.
+    With a `session_id`, the question is answered in the context of that
+    session and the turn is added to it; the session history is compacted
+    after the response is sent.
+
     Args:
         data (ChatRequest): The chat request data.
+        request (Request): The HTTP request.
+        background_tasks (BackgroundTasks): Work run after the response is sent.
+        db (Session): Database session.
 
     Returns:
         JSONResponse: The JSON response containing the chat response.
     """
-    response = run(data.query)
+    user = _get_user(request)
+    session = get_session(db, data.session_id, user.id) if data.session_id else None
+    tier = _admit(user)
+    # Follow-ups depend on the conversation, so only standalone questions are served precomputed.
+    if get_settings().PRECOMPUTED_ENABLED and not session:
+        precomputed = await run_in_threadpool(answer_store.lookup, data.query, data.collections)
+        if precomputed:
+            return JSONResponse(content=precomputed.answer, headers={"X-Degradation-Level": FULL, "X-Answer-Source": "precomputed"})
+    budget = select_budget(scheduler.depth)
+    cancel = CancelToken(timeout=get_settings().CHAT_DEADLINE_SECONDS)
+    watcher = asyncio.create_task(_cancel_on_disconnect(request, cancel))
+    # Only generation waits for the model's queue; retrieval runs alongside other requests.
+    slot = partial(scheduler.slot, user.id, weight=tier["weight"], cancel=cancel)
+    try:
+        if session:
+            response = await answer_in_session(db, session, data.query, data.collections, cancel, budget, slot=slot)
+        else:
+            response, _ = await answer_scheduled(data.query, data.collections, cancel, budget, slot=slot)
+    except GenerationCancelled as exc:
+        if exc.reason == "deadline":
+            raise HTTPException(status_code=504, detail="The answer could not be generated in time. Try POST /chat/jobs.")
+        # The client is gone; nobody will read this.
+        return Response(status_code=499)
+    finally:
+        cancel.cancel("finished")
+        watcher.cancel()
+    if session:
+        # Only spend generation on the summary when the request itself was not degraded.
+        background_tasks.add_task(compact_session, session.id, use_llm=budget.level == FULL)
     print(response)
-    return JSONResponse(content=response)
+    return JSONResponse(content=response, headers={"X-Degradation-Level": budget.level})
+
+@router.get('/collections', status_code=status.HTTP_200_OK)
+async def get_collections():
+    """
+    List the document collections that can be searched.
+
+    Returns:
+        JSONResponse: The JSON response containing the collection names.
+    """
+    collections = await run_in_threadpool(list_collections)
+    return JSONResponse(content=collections)
+
+@router.post('/jobs', status_code=status.HTTP_202_ACCEPTED, response_model=ChatJobResponse)
+async def submit_chat_job(data: ChatRequest, request: Request, db: Session = Depends(get_db)):
+    """
+    Queue a chat request and return immediately with a job id.
+
+    Args:
+        data (ChatRequest): The chat request data.
+        request (Request): The HTTP request.
+        db (Session): Database session.
+
+    Returns:
+        ChatJobResponse: The queued job.
+    """
+    user = _get_user(request)
+    if data.session_id:
+        get_session(db, data.session_id, user.id)
+    _admit(user)
+    return job_queue.submit(db, user.id, data.query, data.collections, data.session_id)
+
+@router.get('/jobs/{job_id}', status_code=status.HTTP_200_OK, response_model=ChatJobResponse)
+async def get_chat_job(
+    job_id: str,
+    request: Request,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish (long polling)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get a chat job, optionally waiting for it to finish.
+
+    Args:
+        job_id (str): The job ID.
+        request (Request): The HTTP request.
+        wait (float): Maximum seconds to wait for completion before returning.
+        db (Session): Database session.
+
+    Returns:
+        ChatJobResponse: The job and, once completed, its answer.
+    """
+    job = db.query(ChatJobModel).filter(
+        ChatJobModel.id == job_id,
+        ChatJobModel.user_id == _get_user(request).id,
+    ).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Chat job not found.")
+
+    if wait:
+        job = await job_queue.wait(db, job, min(wait, get_settings().CHAT_JOB_MAX_WAIT_SECONDS))
+    return job
+
+@router.post('/sessions', status_code=status.HTTP_201_CREATED, response_model=ChatSessionResponse)
+async def start_chat_session(request: Request, db: Session = Depends(get_db)):
+    """
+    Start a chat session for follow-up questions.
+
+    Args:
+        request (Request): The HTTP request.
+        db (Session): Database session.
+
+    Returns:
+        ChatSessionResponse: The new, empty session.
+    """
+    return create_session(db, _get_user(request).id)
+
+@router.get('/sessions/{session_id}', status_code=status.HTTP_200_OK, response_model=ChatSessionResponse)
+async def get_chat_session(session_id: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Get a chat session and its conversation.
+
+    Args:
+        session_id (str): The session ID.
+        request (Request): The HTTP request.
+        db (Session): Database session.
+
+    Returns:
+        ChatSessionResponse: The session and its messages.
+    """
+    session = get_session(db, session_id, _get_user(request).id)
+    return ChatSessionResponse(id=session.id, created_at=session.created_at, messages=[ChatMessageResponse.model_validate(message) for message in get_messages(db, session)])
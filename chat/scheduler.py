@@ -0,0 +1,263 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi.exceptions import HTTPException
+from core.config import get_settings
+
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(retry)
+"""
+
+
+def get_tier(user):
+    """
+    Get the rate limit tier settings for a user.
+
+    Args:
+        user: User model. Unknown tiers fall back to the default tier.
+
+    Returns:
+        dict: Tier settings with `requests_per_minute`, `burst` and `weight`.
+    """
+    settings = get_settings()
+    tiers = settings.RATE_LIMIT_TIERS
+    return tiers.get(getattr(user, "tier", None)) or tiers[settings.RATE_LIMIT_DEFAULT_TIER]
+
+
+class RateLimiter:
+    """
+    Per-user token bucket rate limiter.
+
+    Buckets live in process memory by default. When a Redis URL is given,
+    they are kept in Redis instead so that the limit is shared by every
+    app process.
+    """
+
+    def __init__(self, redis_url=None):
+        """
+        Args:
+            redis_url (str): Optional Redis URL for shared bucket state.
+        """
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+            self._script = self._redis.register_script(_REDIS_TOKEN_BUCKET)
+
+    def _take(self, key, rate, burst):
+        now = time.time()
+        if self._redis is not None:
+            return float(self._script(keys=[f"ratelimit:{key}"], args=[rate, burst, now]))
+
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+            retry = 0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+            return retry
+
+    def check(self, user_id, tier):
+        """
+        Consume one request from the user's bucket.
+
+        Args:
+            user_id (int): The user ID.
+            tier (dict): The user's tier settings.
+
+        Raises:
+            HTTPException: If the user has exhausted their rate limit.
+        """
+        rate = tier["requests_per_minute"] / 60
+        retry = self._take(user_id, rate, tier["burst"])
+        if retry > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many chat requests. Please slow down.",
+                headers={"Retry-After": str(int(retry) + 1)},
+            )
+
+
+class FairScheduler:
+    """
+    Weighted round-robin scheduler for the limited generation slots.
+
+    Waiting requests are queued per user and users take turns, each getting
+    up to `weight` grants per round. A user submitting many requests only
+    lengthens their own queue instead of everyone's. Background work (e.g.
+    summarizing chat sessions) only gets a slot when no request is waiting.
+    """
+
+    def __init__(self, slots, max_queued_per_user):
+        """
+        Args:
+            slots (int): Number of generations allowed to run at once.
+            max_queued_per_user (int): Maximum requests a user may have waiting.
+        """
+        self._slots = slots
+        self._max_queued_per_user = max_queued_per_user
+        self._busy = 0
+        self._queues = {}
+        self._weights = {}
+        self._credits = {}
+        self._order = deque()
+        self._background = deque()
+
+    @property
+    def depth(self):
+        """
+        int: Number of requests waiting for a slot.
+        """
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def busy(self):
+        """
+        int: Number of slots in use.
+        """
+        return self._busy
+
+    @asynccontextmanager
+    async def slot(self, user_id, weight=1, cancel=None, limit_queue=True, background=False):
+        """
+        Hold a generation slot for the duration of the block.
+
+        Args:
+            user_id (int): The user the work is done for.
+            weight (int): The user's share relative to other users.
+            cancel (CancelToken): Stop waiting once the request is cancelled.
+            limit_queue (bool): Enforce the per-user queue limit.
+            background (bool): Lowest priority: wait until no request is waiting.
+                Not counted in `depth` or limited per user.
+
+        Raises:
+            HTTPException: If the user already has too many requests waiting.
+            GenerationCancelled: If the request is cancelled while waiting.
+        """
+        if background:
+            await self._acquire_background(cancel)
+        else:
+            await self._acquire(user_id, weight, cancel, limit_queue)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, user_id, weight, cancel, limit_queue):
+        if self._busy < self._slots and not self._order:
+            self._busy += 1
+            return
+
+        queue = self._queues.get(user_id)
+        if limit_queue and queue and len(queue) >= self._max_queued_per_user:
+            raise HTTPException(
+                status_code=429,
+                detail="You already have too many chat requests waiting.",
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._credits[user_id] = weight
+            self._order.append(user_id)
+        self._weights[user_id] = weight
+        queue.append(future)
+
+        try:
+            await self._wait(future, cancel)
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Granted just as we gave up: hand the slot to the next waiter.
+                self._release()
+            else:
+                future.cancel()
+                self._discard(user_id, future)
+            raise
+
+    async def _acquire_background(self, cancel):
+        if self._busy < self._slots and not self._order and not self._background:
+            self._busy += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._background.append(future)
+        try:
+            await self._wait(future, cancel)
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+                self._background.remove(future)
+            raise
+
+    async def _wait(self, future, cancel):
+        while not future.done():
+            await asyncio.wait({future}, timeout=0.5 if cancel else None)
+            if cancel and not future.done():
+                cancel.raise_if_cancelled()
+
+    def _discard(self, user_id, future):
+        queue = self._queues.get(user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            self._drop_user(user_id)
+
+    def _drop_user(self, user_id):
+        del self._queues[user_id]
+        del self._credits[user_id]
+        del self._weights[user_id]
+        self._order.remove(user_id)
+
+    def _release(self):
+        self._busy -= 1
+        while self._busy < self._slots and self._order:
+            user_id = self._order[0]
+            queue = self._queues[user_id]
+            future = queue.popleft()
+            self._credits[user_id] -= 1
+            if not queue:
+                self._drop_user(user_id)
+            elif self._credits[user_id] <= 0:
+                self._credits[user_id] = self._weights[user_id]
+                self._order.rotate(-1)
+            if future.cancelled():
+                continue
+            self._busy += 1
+            future.set_result(None)
+        while self._busy < self._slots and not self._order and self._background:
+            future = self._background.popleft()
+            if future.cancelled():
+                continue
+            self._busy += 1
+            future.set_result(None)
+
+
+settings = get_settings()
+
+rate_limiter = RateLimiter(redis_url=settings.RATE_LIMIT_REDIS_URL)
+scheduler = FairScheduler(slots=settings.LLM_CONCURRENCY, max_queued_per_user=settings.CHAT_MAX_QUEUED_PER_USER)
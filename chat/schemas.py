@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class ChatScheme(BaseModel):
@@ -14,5 +15,9 @@ class ChatRequest(ChatScheme):
 
     Attributes:
         query (str): The message to be sent to the chatbot.
+        collections (Optional[List[str]]): Collections to restrict the search to.
+        session_id (Optional[str]): Chat session to continue; follow-up questions use its history.
     """
     query: str = Field(..., title="Query", description="Message to be sent to the chatbot")
+    collections: Optional[List[str]] = Field(None, title="Collections", description="Only search documents in these collections")
+    session_id: Optional[str] = Field(None, title="Session ID", description="Chat session to continue, from POST /chat/sessions")
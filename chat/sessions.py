@@ -0,0 +1,241 @@
+import uuid
+import logging
+from datetime import datetime
+from fastapi.exceptions import HTTPException
+from starlette.concurrency import run_in_threadpool
+from core.config import get_settings
+from core.database import SessionLocal
+from chat.models import ChatSessionModel, ChatMessageModel
+from chat import inf
+from chat.scheduler import scheduler
+
+ROLES = {"user": "User", "assistant": "Assistant"}
+
+
+def create_session(db, user_id):
+    """
+    Start a new chat session.
+
+    Args:
+        db: Database session.
+        user_id (int): Owner of the session.
+
+    Returns:
+        ChatSessionModel: The new session.
+    """
+    session = ChatSessionModel(id=str(uuid.uuid4()), user_id=user_id, summarized_until=0)
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+
+def get_session(db, session_id, user_id):
+    """
+    Get a chat session owned by the user.
+
+    Args:
+        db: Database session.
+        session_id (str): The session ID.
+        user_id (int): The user ID.
+
+    Returns:
+        ChatSessionModel: The session.
+
+    Raises:
+        HTTPException: If the session does not exist or belongs to another user.
+    """
+    session = db.query(ChatSessionModel).filter(
+        ChatSessionModel.id == session_id,
+        ChatSessionModel.user_id == user_id,
+    ).first()
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found.")
+
+    return session
+
+
+def get_messages(db, session, after=0):
+    """
+    Get the messages of a session in conversation order.
+
+    Args:
+        db: Database session.
+        session (ChatSessionModel): The session.
+        after (int): Only return messages with a greater id.
+
+    Returns:
+        list[ChatMessageModel]: The messages.
+    """
+    return db.query(ChatMessageModel).filter(
+        ChatMessageModel.session_id == session.id,
+        ChatMessageModel.id > after,
+    ).order_by(ChatMessageModel.id).all()
+
+
+def _format_lines(messages):
+    return "\n".join(f"{ROLES[message.role]}: {' '.join(message.content.split())}" for message in messages)
+
+
+def format_history(summary, messages):
+    """
+    Format the conversation for the prompt.
+
+    Args:
+        summary (str): Rolling summary of earlier turns.
+        messages (list[ChatMessageModel]): Turns not yet folded into the summary.
+
+    Returns:
+        str: The conversation, or an empty string for a new session.
+    """
+    parts = []
+    if summary:
+        parts.append(f"Summary: {summary}")
+    if messages:
+        parts.append(_format_lines(messages))
+    return "\n".join(parts)
+
+
+def build_history(db, session):
+    """
+    Get the session's conversation as prompt text, bounded to `CHAT_HISTORY_MAX_TOKENS`.
+
+    Args:
+        db: Database session.
+        session (ChatSessionModel): The session.
+
+    Returns:
+        str: The formatted conversation.
+    """
+    history = format_history(session.summary, get_messages(db, session, after=session.summarized_until))
+    # Last resort if compaction could not keep up: keep the most recent part (~4 characters per token).
+    limit = get_settings().CHAT_HISTORY_MAX_TOKENS * 4
+    return history[-limit:] if len(history) > limit else history
+
+
+def _turns_to_fold(db, session):
+    """
+    Get the turns that must be folded into the summary for the history to fit its budget.
+
+    Args:
+        db: Database session.
+        session (ChatSessionModel): The session.
+
+    Returns:
+        list[ChatMessageModel]: The oldest unsummarized messages; empty if the history fits.
+    """
+    settings = get_settings()
+    messages = get_messages(db, session, after=session.summarized_until)
+    keep = settings.CHAT_HISTORY_RECENT_TURNS * 2
+    if len(messages) <= keep:
+        return []
+    if inf.count_tokens(format_history(session.summary, messages)) <= settings.CHAT_HISTORY_MAX_TOKENS:
+        return []
+    return messages[:len(messages) - keep]
+
+
+def compact(db, session, use_llm=True):
+    """
+    Fold older turns into the rolling summary until the history fits its token budget.
+
+    The most recent `CHAT_HISTORY_RECENT_TURNS` turns are kept verbatim.
+    Summaries are written by the small model; without one registered (or
+    under load) the oldest turns are summarized by truncation instead, so
+    compaction never spends a generation on the large model.
+
+    Args:
+        db: Database session.
+        session (ChatSessionModel): The session.
+        use_llm (bool): Allow the language model to write the summary.
+    """
+    settings = get_settings()
+    folded = _turns_to_fold(db, session)
+    if not folded:
+        return
+
+    new_lines = _format_lines(folded)
+    summary = None
+    if use_llm and can_summarize():
+        try:
+            summary = inf.summarize(session.summary, new_lines)
+        except Exception:
+            logging.exception(f"Could not summarize chat session {session.id}")
+    if not summary:
+        summary = " ".join(part for part in (session.summary, new_lines.replace("\n", " ")) if part)
+
+    summary_limit = settings.CHAT_SUMMARY_MAX_TOKENS * 4
+    session.summary = summary[-summary_limit:]
+    session.summarized_until = folded[-1].id
+    db.commit()
+
+
+def can_summarize():
+    """
+    bool: Whether a small model is registered to write session summaries.
+    """
+    return get_settings().LLM_ROUTER_SMALL_MODEL in inf.chains
+
+
+def _find_session(db, session_id):
+    return db.query(ChatSessionModel).filter(ChatSessionModel.id == session_id).first()
+
+
+async def compact_session(session_id, use_llm=True):
+    """
+    Compact a session in its own database session.
+
+    Meant to run after the response has been sent. A summary written by the
+    model goes through the generation scheduler as background work, so it
+    only runs when no request is waiting for the model.
+
+    Args:
+        session_id (str): The session ID.
+        use_llm (bool): Allow the language model to write the summary.
+    """
+    db = SessionLocal()
+    try:
+        session = await run_in_threadpool(_find_session, db, session_id)
+        if not session or not await run_in_threadpool(_turns_to_fold, db, session):
+            return
+        if use_llm and can_summarize():
+            async with scheduler.slot(session.user_id, background=True):
+                await run_in_threadpool(compact, db, session, True)
+        else:
+            await run_in_threadpool(compact, db, session, False)
+    except Exception:
+        logging.exception(f"Could not compact chat session {session_id}")
+    finally:
+        db.close()
+
+
+def _record_turn(db, session, query, answer):
+    db.add(ChatMessageModel(session_id=session.id, role="user", content=query))
+    db.add(ChatMessageModel(session_id=session.id, role="assistant", content=answer))
+    session.updated_at = datetime.now()
+    db.commit()
+
+
+async def answer_in_session(db, session, query, collections=None, cancel=None, budget=None, slot=None):
+    """
+    Answer a question in the context of a session and record the turn.
+
+    The history is not compacted here; call `compact_session` once the
+    answer has been delivered.
+
+    Args:
+        db: Database session.
+        session (ChatSessionModel): The session.
+        query (str): The user's question.
+        collections (list[str]): Restrict retrieval to these collections.
+        cancel (CancelToken): Aborts the pipeline once cancelled.
+        budget (GenerationBudget): Limits on context and generation.
+        slot (Callable): Returns the async context manager held around generation.
+
+    Returns:
+        str: The answer.
+    """
+    history = await run_in_threadpool(build_history, db, session)
+    answer, _ = await inf.answer_scheduled(query, collections, cancel, budget, history=history, slot=slot)
+    await run_in_threadpool(_record_turn, db, session, query, answer)
+    return answer
@@ -1,5 +1,7 @@
 import os
+import json
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
 from pydantic_settings import BaseSettings
@@ -8,6 +10,11 @@ from fastapi_mail import ConnectionConfig
 env_path = Path(".") / ".env"
 load_dotenv(dotenv_path=env_path)
 
+# Hugging Face libraries read these at import time, so set them before anything imports them.
+if os.getenv('OFFLINE_MODE', 'false').lower() in ('1', 'true', 'yes', 'on'):
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
 class Settings(BaseSettings):
     """
     Application settings.
@@ -22,12 +29,83 @@ class Settings(BaseSettings):
         JWT_SECRET (str): JWT secret key.
         JWT_ALGORITHM (str): JWT algorithm.
         ACCESS_TOKEN_EXPIRE_MINUTES (int): Access token expiration time in minutes.
+        REFRESH_TOKEN_EXPIRE_DAYS (int): Refresh token expiration time in days.
+        TOKEN_CACHE_SIZE (int): Number of verified tokens whose payload is kept in memory.
+        TOKEN_REVOCATION_SYNC_SECONDS (int): How often the revoked token list is reloaded from the database.
         MAIL_USERNAME (str): Email username.
         MAIL_PASSWORD (str): Email password.
         MAIL_FROM (str): Email sender address.
         MAIL_PORT (int): Email server port.
         MAIL_SERVER (str): Email server address.
         MAIL_FROM_NAME (str): Email sender name.
+        OFFLINE_MODE (bool): Load all models from MODEL_DIR and never contact the Hugging Face hub.
+        MODEL_DIR (str): Local model directory, laid out as `<repo_id>/<filename>`.
+        MODEL_CHECKSUMS (str): JSON manifest of SHA-256 checksums; defaults to `MODEL_DIR/checksums.json`.
+        PREWARM_MODELS (bool): Read model weights into the page cache before serving.
+        EMBEDDING_MODEL (str): Sentence embedding model id or local path.
+        EMBEDDING_BACKEND (str): Embedding runtime: "onnx", "torch" or "auto".
+        EMBEDDING_ONNX_FILE (str): ONNX file to load, relative to the model repository (e.g. a quantized export under `onnx/`).
+        EMBEDDING_CACHE_SIZE (int): Number of query embeddings kept in the LRU cache.
+        EMBEDDING_MAX_BATCH_SIZE (int): Maximum queries embedded in one forward pass.
+        EMBEDDING_BATCH_WAIT_MS (float): Time to wait for concurrent queries to batch together.
+        PINECONE_INDEX (str): Name of the Pinecone index.
+        CORPUS_DIR (str): Directory of PDF documents to ingest; sub-directories name collections.
+        CORPUS_MANIFEST (str): Optional JSON manifest listing documents to ingest.
+        DEFAULT_COLLECTION (str): Collection for documents that do not specify one.
+        INGEST_ON_STARTUP (bool): Ingest new or changed corpus documents when the app starts.
+        INGEST_WORKERS (int): Number of processes used to parse and split PDFs.
+        INGEST_PAGES_PER_TASK (int): PDF pages parsed by one worker task.
+        INGEST_TASKS_PER_WORKER (int): Parse tasks kept in flight per worker; bounds ingestion memory.
+        INGEST_EMBED_BATCH_SIZE (int): Chunks embedded per batch during ingestion.
+        INGEST_UPSERT_BATCH_SIZE (int): Vectors sent per Pinecone upsert request.
+        CHUNK_SIZE (int): Maximum characters per indexed chunk.
+        CHUNK_OVERLAP (int): Characters shared between consecutive chunks.
+        RETRIEVAL_K (int): Number of chunks retrieved per query.
+        RERANK_ENABLED (bool): Rerank a wider candidate set with a cross-encoder before generation.
+        RERANK_MODEL (str): Cross-encoder model id or local path.
+        RERANK_CANDIDATES (int): Number of candidates retrieved for reranking.
+        RERANK_TOP_N (int): Number of reranked chunks passed to the LLM.
+        RERANK_BATCH_SIZE (int): Candidate pairs scored per cross-encoder forward pass.
+        CHAT_DEADLINE_SECONDS (float): Deadline for synchronous chat requests; generation is aborted after it.
+        CHAT_JOB_DEADLINE_SECONDS (float): Deadline for answering a chat job once a worker picks it up.
+        LLM_MODELS (dict): Registered GGUF models by name, each with `repo_id`, `filename` and optional overrides of the LLM_* settings below.
+        LLM_N_CTX (int): Default context window in tokens.
+        LLM_N_BATCH (int): Default prompt evaluation batch size.
+        LLM_N_THREADS (int): Default CPU threads per model; physical cores is usually best.
+        LLM_N_GPU_LAYERS (int): Default layers offloaded to a GPU; 0 on CPU-only nodes.
+        LLM_USE_MMAP (bool): Memory-map model files.
+        LLM_USE_MLOCK (bool): Lock model weights in RAM.
+        LLM_MAX_TOKENS (int): Default generation limit.
+        LLM_KV_CACHE_MB (int): Per-model RAM cache of llama.cpp KV states, reused across turns with a shared prompt prefix. 0 disables it.
+        LLM_TUNING_FILE (str): Per-node settings written by `python -m chat.bench`; overrides the values above.
+        LLM_ROUTER_ENABLED (bool): Route simple questions to the small model.
+        LLM_ROUTER_SMALL_MODEL (str): Registry name of the fast model.
+        LLM_ROUTER_LARGE_MODEL (str): Registry name of the default, higher quality model.
+        LLM_ROUTER_MAX_WORDS (int): Longest question still considered simple.
+        LLM_CONCURRENCY (int): Number of chat generations allowed to run at once per process.
+        CHAT_MAX_QUEUED_PER_USER (int): Maximum chat requests a user may have waiting for the model.
+        RATE_LIMIT_ENABLED (bool): Enforce per-user chat rate limits.
+        RATE_LIMIT_TIERS (dict): Per account tier `requests_per_minute`, `burst` and scheduling `weight`.
+        RATE_LIMIT_DEFAULT_TIER (str): Tier used for accounts without a known tier.
+        RATE_LIMIT_REDIS_URL (str): Optional Redis URL to share rate limit state between processes.
+        CHAT_HISTORY_MAX_TOKENS (int): Token budget for session history in the prompt (fits within n_ctx).
+        CHAT_HISTORY_RECENT_TURNS (int): Most recent turns kept verbatim; older ones are summarized.
+        CHAT_SUMMARY_MAX_TOKENS (int): Maximum length of a session's rolling summary.
+        CHAT_CONDENSE_MAX_TOKENS (int): Maximum length of a condensed standalone question.
+        PRECOMPUTED_ENABLED (bool): Serve precomputed answers to matching questions.
+        PRECOMPUTED_MATCH_THRESHOLD (float): Minimum cosine similarity for a question to match a precomputed one.
+        PRECOMPUTED_REFRESH_SECONDS (int): How often the precomputed answers are reloaded from the database.
+        PRECOMPUTED_WORKERS (int): Questions answered concurrently by the batch job.
+        DEGRADE_ENABLED (bool): Shrink or skip generation when the model queue is deep.
+        DEGRADE_REDUCED_QUEUE_DEPTH (int): Queue depth at which answers are shortened.
+        DEGRADE_REDUCED_MAX_TOKENS (int): Generation limit for shortened answers.
+        DEGRADE_REDUCED_K (int): Chunks passed to the LLM for shortened answers.
+        DEGRADE_EXTRACTIVE_QUEUE_DEPTH (int): Queue depth at which passages are returned without generation.
+        DEGRADE_EXTRACTIVE_K (int): Passages returned in an extractive answer.
+        CHAT_JOB_WORKERS (int): Number of chat jobs answered concurrently per process.
+        CHAT_JOB_MAX_WAIT_SECONDS (float): Upper bound for long polling on a chat job.
+        CHAT_JOB_HEARTBEAT_SECONDS (int): How often a process marks its running jobs as alive and looks for orphaned ones.
+        CHAT_JOB_STALE_SECONDS (int): Time without a heartbeat after which a running job is assumed orphaned and re-queued.
     """
     
     # Database
@@ -42,6 +120,9 @@ class Settings(BaseSettings):
     JWT_SECRET: str = os.getenv('JWT_SECRET', '709d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7')
     JWT_ALGORITHM: str = os.getenv('JWT_ALGORITHM', "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = os.getenv('JWT_TOKEN_EXPIRE_MINUTES', 60)
+    REFRESH_TOKEN_EXPIRE_DAYS: int = os.getenv('JWT_REFRESH_TOKEN_EXPIRE_DAYS', 7)
+    TOKEN_CACHE_SIZE: int = os.getenv('TOKEN_CACHE_SIZE', 10000)
+    TOKEN_REVOCATION_SYNC_SECONDS: int = os.getenv('TOKEN_REVOCATION_SYNC_SECONDS', 30)
 
     # Email
     MAIL_USERNAME: str = os.getenv('MAIL_USERNAME')
@@ -51,6 +132,101 @@ class Settings(BaseSettings):
     MAIL_SERVER: str = os.getenv('MAIL_SERVER')
     MAIL_FROM_NAME: str = os.getenv('MAIL_FROM_NAME')
 
+    # Model Assets
+    OFFLINE_MODE: bool = os.getenv('OFFLINE_MODE', False)
+    MODEL_DIR: str = os.getenv('MODEL_DIR', 'models')
+    MODEL_CHECKSUMS: Optional[str] = os.getenv('MODEL_CHECKSUMS')
+    PREWARM_MODELS: bool = os.getenv('PREWARM_MODELS', True)
+
+    # Embeddings
+    EMBEDDING_MODEL: str = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+    EMBEDDING_BACKEND: str = os.getenv('EMBEDDING_BACKEND', 'auto')
+    EMBEDDING_ONNX_FILE: str = os.getenv('EMBEDDING_ONNX_FILE', 'onnx/model.onnx')
+    EMBEDDING_CACHE_SIZE: int = os.getenv('EMBEDDING_CACHE_SIZE', 1024)
+    EMBEDDING_MAX_BATCH_SIZE: int = os.getenv('EMBEDDING_MAX_BATCH_SIZE', 16)
+    EMBEDDING_BATCH_WAIT_MS: float = os.getenv('EMBEDDING_BATCH_WAIT_MS', 5)
+
+    # Corpus
+    PINECONE_INDEX: str = os.getenv('PINECONE_INDEX', 'llamaprac')
+    CORPUS_DIR: str = os.getenv('CORPUS_DIR', 'assets/files')
+    CORPUS_MANIFEST: Optional[str] = os.getenv('CORPUS_MANIFEST')
+    DEFAULT_COLLECTION: str = os.getenv('DEFAULT_COLLECTION', 'constitution')
+    INGEST_ON_STARTUP: bool = os.getenv('INGEST_ON_STARTUP', True)
+    INGEST_WORKERS: int = os.getenv('INGEST_WORKERS', os.cpu_count() or 1)
+    INGEST_PAGES_PER_TASK: int = os.getenv('INGEST_PAGES_PER_TASK', 25)
+    INGEST_TASKS_PER_WORKER: int = os.getenv('INGEST_TASKS_PER_WORKER', 2)
+    INGEST_EMBED_BATCH_SIZE: int = os.getenv('INGEST_EMBED_BATCH_SIZE', 64)
+    INGEST_UPSERT_BATCH_SIZE: int = os.getenv('INGEST_UPSERT_BATCH_SIZE', 100)
+    CHUNK_SIZE: int = os.getenv('CHUNK_SIZE', 500)
+    CHUNK_OVERLAP: int = os.getenv('CHUNK_OVERLAP', 150)
+    RETRIEVAL_K: int = os.getenv('RETRIEVAL_K', 4)
+
+    # Reranking
+    RERANK_ENABLED: bool = os.getenv('RERANK_ENABLED', False)
+    RERANK_MODEL: str = os.getenv('RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+    RERANK_CANDIDATES: int = os.getenv('RERANK_CANDIDATES', 20)
+    RERANK_TOP_N: int = os.getenv('RERANK_TOP_N', 3)
+    RERANK_BATCH_SIZE: int = os.getenv('RERANK_BATCH_SIZE', 32)
+
+    # Chat Deadlines
+    CHAT_DEADLINE_SECONDS: float = os.getenv('CHAT_DEADLINE_SECONDS', 60)
+    CHAT_JOB_DEADLINE_SECONDS: float = os.getenv('CHAT_JOB_DEADLINE_SECONDS', 600)
+
+    # Language Models
+    LLM_MODELS: dict = json.loads(os.getenv('LLM_MODELS', json.dumps({
+        "large": {"repo_id": "TheBloke/Llama-2-7b-Chat-GGUF", "filename": "llama-2-7b-chat.Q5_0.gguf"},
+    })))
+    LLM_N_CTX: int = os.getenv('LLM_N_CTX', 1024)
+    LLM_N_BATCH: int = os.getenv('LLM_N_BATCH', 256)
+    LLM_N_THREADS: int = os.getenv('LLM_N_THREADS', max(1, (os.cpu_count() or 2) // 2))
+    LLM_N_GPU_LAYERS: int = os.getenv('LLM_N_GPU_LAYERS', 0)
+    LLM_USE_MMAP: bool = os.getenv('LLM_USE_MMAP', True)
+    LLM_USE_MLOCK: bool = os.getenv('LLM_USE_MLOCK', False)
+    LLM_MAX_TOKENS: int = os.getenv('LLM_MAX_TOKENS', 256)
+    LLM_KV_CACHE_MB: int = os.getenv('LLM_KV_CACHE_MB', 0)
+    LLM_TUNING_FILE: str = os.getenv('LLM_TUNING_FILE', 'assets/tuning.json')
+    LLM_ROUTER_ENABLED: bool = os.getenv('LLM_ROUTER_ENABLED', True)
+    LLM_ROUTER_SMALL_MODEL: str = os.getenv('LLM_ROUTER_SMALL_MODEL', 'small')
+    LLM_ROUTER_LARGE_MODEL: str = os.getenv('LLM_ROUTER_LARGE_MODEL', 'large')
+    LLM_ROUTER_MAX_WORDS: int = os.getenv('LLM_ROUTER_MAX_WORDS', 12)
+
+    # Admission Control
+    LLM_CONCURRENCY: int = os.getenv('LLM_CONCURRENCY', 1)
+    CHAT_MAX_QUEUED_PER_USER: int = os.getenv('CHAT_MAX_QUEUED_PER_USER', 3)
+    RATE_LIMIT_ENABLED: bool = os.getenv('RATE_LIMIT_ENABLED', True)
+    RATE_LIMIT_TIERS: dict = json.loads(os.getenv('RATE_LIMIT_TIERS', json.dumps({
+        "free": {"requests_per_minute": 6, "burst": 5, "weight": 1},
+        "pro": {"requests_per_minute": 30, "burst": 15, "weight": 3},
+    })))
+    RATE_LIMIT_DEFAULT_TIER: str = os.getenv('RATE_LIMIT_DEFAULT_TIER', 'free')
+    RATE_LIMIT_REDIS_URL: Optional[str] = os.getenv('RATE_LIMIT_REDIS_URL')
+
+    # Chat Sessions
+    CHAT_HISTORY_MAX_TOKENS: int = os.getenv('CHAT_HISTORY_MAX_TOKENS', 256)
+    CHAT_HISTORY_RECENT_TURNS: int = os.getenv('CHAT_HISTORY_RECENT_TURNS', 1)
+    CHAT_SUMMARY_MAX_TOKENS: int = os.getenv('CHAT_SUMMARY_MAX_TOKENS', 128)
+    CHAT_CONDENSE_MAX_TOKENS: int = os.getenv('CHAT_CONDENSE_MAX_TOKENS', 48)
+
+    # Precomputed Answers
+    PRECOMPUTED_ENABLED: bool = os.getenv('PRECOMPUTED_ENABLED', True)
+    PRECOMPUTED_MATCH_THRESHOLD: float = os.getenv('PRECOMPUTED_MATCH_THRESHOLD', 0.92)
+    PRECOMPUTED_REFRESH_SECONDS: int = os.getenv('PRECOMPUTED_REFRESH_SECONDS', 60)
+    PRECOMPUTED_WORKERS: int = os.getenv('PRECOMPUTED_WORKERS', 4)
+
+    # Degradation
+    DEGRADE_ENABLED: bool = os.getenv('DEGRADE_ENABLED', True)
+    DEGRADE_REDUCED_QUEUE_DEPTH: int = os.getenv('DEGRADE_REDUCED_QUEUE_DEPTH', 2)
+    DEGRADE_REDUCED_MAX_TOKENS: int = os.getenv('DEGRADE_REDUCED_MAX_TOKENS', 96)
+    DEGRADE_REDUCED_K: int = os.getenv('DEGRADE_REDUCED_K', 2)
+    DEGRADE_EXTRACTIVE_QUEUE_DEPTH: int = os.getenv('DEGRADE_EXTRACTIVE_QUEUE_DEPTH', 6)
+    DEGRADE_EXTRACTIVE_K: int = os.getenv('DEGRADE_EXTRACTIVE_K', 3)
+
+    # Chat Jobs
+    CHAT_JOB_WORKERS: int = os.getenv('CHAT_JOB_WORKERS', 1)
+    CHAT_JOB_MAX_WAIT_SECONDS: float = os.getenv('CHAT_JOB_MAX_WAIT_SECONDS', 30)
+    CHAT_JOB_HEARTBEAT_SECONDS: int = os.getenv('CHAT_JOB_HEARTBEAT_SECONDS', 30)
+    CHAT_JOB_STALE_SECONDS: int = os.getenv('CHAT_JOB_STALE_SECONDS', 120)
+
 mail_conf = ConnectionConfig(
     MAIL_USERNAME=os.getenv('MAIL_USERNAME'),
     MAIL_PASSWORD=os.getenv('MAIL_PASSWORD'),
@@ -1,18 +1,172 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from starlette.authentication import AuthCredentials, UnauthenticatedUser
 from datetime import timedelta, datetime
 from jose import jwt, JWTError
+from sqlalchemy.exc import IntegrityError
 from core.config import get_settings
 from fastapi import Depends
-from core.database import get_db
+from core.database import get_db, SessionLocal
 from users.models import UserModel
+from auth.models import RevokedTokenModel
 
 settings = get_settings()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+class TokenCache:
+    """
+    Thread-safe, size-bounded cache of verified token payloads.
+
+    Saves decoding and verifying the signature of the same token on every
+    request. An entry is dropped once the token's `exp` has passed, so a
+    cached payload is never accepted for longer than the token itself.
+    """
+
+    def __init__(self, max_size):
+        """
+        Args:
+            max_size (int): Maximum number of tokens kept; the least recently used are evicted.
+        """
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """
+        Get the payload of a previously verified token.
+
+        Args:
+            token (str): The JWT token.
+
+        Returns:
+            dict: The payload, or None if the token is not cached or has expired.
+        """
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is None:
+                return None
+            exp = payload.get("exp")
+            if exp is not None and exp <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token, payload):
+        """
+        Remember the payload of a verified token.
+
+        Args:
+            token (str): The JWT token.
+            payload (dict): Its verified payload.
+        """
+        if not self._max_size:
+            return
+        with self._lock:
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+class RevocationList:
+    """
+    In-memory set of revoked token ids, synced from the database.
+
+    Checking a token is a set lookup; the database is read at most every
+    `sync_seconds`. Revocations made by this process apply immediately,
+    those made by other processes after the next sync.
+    """
+
+    def __init__(self, sync_seconds):
+        """
+        Args:
+            sync_seconds (int): How often to reload the revoked token ids.
+        """
+        self._sync_seconds = sync_seconds
+        self._jtis = set()
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """
+        Reload the ids of revoked tokens that have not expired yet.
+        """
+        db = SessionLocal()
+        try:
+            rows = db.query(RevokedTokenModel.jti).filter(RevokedTokenModel.expires_at > datetime.utcnow()).all()
+            self._jtis = {row[0] for row in rows}
+        except Exception:
+            # Keep the last known list rather than failing every request.
+            logging.exception("Could not sync revoked tokens")
+        finally:
+            db.close()
+            self._synced_at = time.monotonic()
+
+    def _stale(self):
+        return self._synced_at is None or time.monotonic() - self._synced_at > self._sync_seconds
+
+    def is_revoked(self, jti):
+        """
+        Check whether a token has been revoked.
+
+        Args:
+            jti (str): The token id.
+
+        Returns:
+            bool: True if the token was revoked.
+        """
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self.sync()
+        return jti in self._jtis
+
+    def revoke(self, payload, db):
+        """
+        Revoke a token until it expires.
+
+        The revocation row is inserted without checking for an existing one
+        first; the unique `jti` decides between concurrent revocations, so
+        exactly one of them succeeds.
+
+        Args:
+            payload (dict): Verified payload of the token. Tokens without a `jti` cannot be revoked.
+            db: Database session.
+
+        Returns:
+            bool: True if this call revoked the token, False if it was already revoked.
+        """
+        jti = payload.get("jti")
+        if not jti:
+            return False
+        now = datetime.utcnow()
+        # Expired tokens are rejected anyway; their revocations are no longer needed.
+        db.query(RevokedTokenModel).filter(RevokedTokenModel.expires_at <= now).delete()
+        db.commit()
+
+        exp = payload.get("exp")
+        expires_at = datetime.utcfromtimestamp(exp) if exp else now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        db.add(RevokedTokenModel(jti=jti, user_id=payload.get("id"), expires_at=expires_at))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            revoked = False
+        else:
+            revoked = True
+        self._jtis.add(jti)
+        return revoked
+
+token_cache = TokenCache(max_size=settings.TOKEN_CACHE_SIZE)
+revoked_tokens = RevocationList(sync_seconds=settings.TOKEN_REVOCATION_SYNC_SECONDS)
+
 def get_password_hash(password):
     """
     Get the hashed version of a password.
@@ -51,34 +205,50 @@ async def create_access_token(data, expiry: timedelta):
     """
     payload = data.copy()
     expire_in = datetime.utcnow() + expiry
-    payload.update({"exp": expire_in})
+    payload.update({"exp": expire_in, "jti": uuid.uuid4().hex})
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
-async def create_refresh_token(data):
+async def create_refresh_token(data, expiry: timedelta = None):
     """
     Create a refresh token.
 
+    Refresh tokens carry an id (`jti`) so that they can be revoked.
+
     Args:
         data (dict): The data to be included in the token payload.
+        expiry (timedelta): The expiration time for the token. Defaults to `REFRESH_TOKEN_EXPIRE_DAYS`.
 
     Returns:
         str: The refresh token.
     """
-    return jwt.encode(data, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    payload = data.copy()
+    expire_in = datetime.utcnow() + (expiry or timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+    payload.update({"exp": expire_in, "jti": uuid.uuid4().hex, "type": "refresh"})
+    return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
 def get_token_payload(token):
     """
     Get the payload of a JWT token.
 
+    Verified payloads are cached until the token expires, and revoked tokens
+    are rejected without a database query.
+
     Args:
         token (str): The JWT token.
 
     Returns:
-        dict: The token payload.
+        dict: The token payload, or None if the token is invalid, expired or revoked.
     """
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-    except JWTError:
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        except JWTError:
+            return None
+        token_cache.put(token, payload)
+
+    jti = payload.get('jti')
+    if jti and revoked_tokens.is_revoked(jti):
         return None
     return payload
 
@@ -97,6 +267,10 @@ def get_current_user(token: str = Depends(oauth2_scheme), db=None):
     if not payload or type(payload) is not dict:
         return None
 
+    # Refresh tokens only buy new access tokens.
+    if payload.get('type') == 'refresh':
+        return None
+
     user_id = payload.get('id', None)
     if not user_id:
         return None
@@ -7,11 +7,16 @@ from sqlalchemy.exc import OperationalError
 from colorama import Fore, Style
 
 from core.database import engine
-from core.security import JWTAuth
+from core.security import JWTAuth, revoked_tokens
 from users import models
+from auth import models as auth_models
+from chat import models as chat_models
 from users.routes import router as guest_router, user_router
 from chat.routes import router as chat_router
 from chat.inf import init as chat_init
+from chat.jobs import job_queue
+from chat.precompute import answer_store
+from core.config import get_settings
 from auth.routes import router as auth_router
 
 # Color Codes
@@ -55,6 +60,9 @@ while True:
         print(ColorCode.RED + "Connection failed. Retrying...")
         time.sleep(1)
 
+# Load revoked tokens before the first request
+revoked_tokens.sync()
+
 # Add Middleware for JWT Authentication
 app.add_middleware(AuthenticationMiddleware, backend=JWTAuth())
 
@@ -62,8 +70,25 @@ app.add_middleware(AuthenticationMiddleware, backend=JWTAuth())
 print(ColorCode.YELLOW + "----Initializing Chat Model...----")
 print(ColorCode.YELLOW + "Please wait until the initialization is complete. This may take some time.")
 chat_init()
+if get_settings().PRECOMPUTED_ENABLED:
+    answer_store.refresh()
 print(ColorCode.GREEN + "----Chat Model Initialized!----")
 
+# Chat Job Workers
+@app.on_event("startup")
+async def start_chat_jobs():
+    """
+    Start answering queued chat jobs, including ones left over from a previous run.
+    """
+    await job_queue.start(workers=get_settings().CHAT_JOB_WORKERS)
+
+@app.on_event("shutdown")
+async def stop_chat_jobs():
+    """
+    Stop the chat job workers. Unfinished jobs are resumed on the next startup.
+    """
+    await job_queue.stop()
+
 # Testing Route
 @app.get("/")
 async def hello_world(text: str = "I am online!"):
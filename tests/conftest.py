@@ -0,0 +1,16 @@
+import os
+
+# core.config builds the database URL and mail settings at import time.
+for name, value in {
+    "MYSQL_USER": "test",
+    "MYSQL_ROOT_PASSWORD": "test",
+    "MYSQL_DATABASE": "test",
+    "MYSQL_SERVER": "localhost",
+    "MYSQL_PORT": "3306",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "test@example.com",
+    "MAIL_PORT": "587",
+    "MAIL_SERVER": "localhost",
+}.items():
+    os.environ.setdefault(name, value)
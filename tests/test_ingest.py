@@ -0,0 +1,191 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+from chat import ingest
+
+PAGES = {"a.pdf": 2, "b.pdf": 1}
+CHUNKS_PER_PAGE = {"a.pdf": 3, "b.pdf": 2}
+# Page tasks of A and B finish interleaved, so embed batches mix both documents.
+TASK_ORDER = [("a.pdf", 0), ("b.pdf", 0), ("a.pdf", 1)]
+
+
+class StubDocsearch:
+    def __init__(self):
+        self.upserted = []
+        self.metadata = {}
+        self.deleted = []
+
+    def add_texts(self, texts, metadatas, ids, **kwargs):
+        assert len(texts) == len(metadatas) == len(ids)
+        self.upserted.extend(zip(ids, texts))
+        self.metadata.update(zip(ids, metadatas))
+
+    def delete(self, ids=None, **kwargs):
+        self.deleted.extend(ids)
+
+
+class StubQuery:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class StubSession:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def query(self, *args):
+        return StubQuery(self.rows)
+
+    def add(self, row):
+        self.rows.append(row)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class InlinePool:
+    def __init__(self, max_workers=None, mp_context=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+
+def _page_tasks(documents, pages_per_task):
+    by_source = {document["source"]: document for document in documents}
+    for document in documents:
+        document["tasks"] = PAGES[document["source"]]
+    for source, page in TASK_ORDER:
+        if source in by_source:
+            yield by_source[source], page, page + 1
+
+
+def _parse_pages(source, start, end, chunk_size, chunk_overlap):
+    return [(f"{source} page {start} chunk {i}", start) for i in range(CHUNKS_PER_PAGE[source])]
+
+
+@pytest.fixture
+def corpus(monkeypatch):
+    session = StubSession([])
+    settings = SimpleNamespace(
+        INGEST_WORKERS=1,
+        INGEST_TASKS_PER_WORKER=2,
+        INGEST_PAGES_PER_TASK=1,
+        INGEST_EMBED_BATCH_SIZE=4,
+        INGEST_UPSERT_BATCH_SIZE=100,
+        CHUNK_SIZE=500,
+        CHUNK_OVERLAP=0,
+    )
+    monkeypatch.setattr(ingest, "get_settings", lambda: settings)
+    monkeypatch.setattr(ingest, "SessionLocal", lambda: session)
+    monkeypatch.setattr(ingest, "ProcessPoolExecutor", InlinePool)
+    monkeypatch.setattr(ingest, "file_checksum", lambda source: f"new-{source[0]}")
+    monkeypatch.setattr(ingest, "_page_tasks", _page_tasks)
+    monkeypatch.setattr(ingest, "_parse_pages", _parse_pages)
+    documents = [
+        {"source": source, "title": source, "collection": "test"}
+        for source in PAGES
+    ]
+    return session, documents
+
+
+def test_interleaved_documents_get_contiguous_unique_ids(corpus):
+    session, documents = corpus
+    docsearch = StubDocsearch()
+
+    assert ingest.ingest_corpus(docsearch, documents) == 2
+
+    ids = [vector_id for vector_id, _ in docsearch.upserted]
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(
+        [ingest.vector_id("a.pdf", "new-a", i) for i in range(6)]
+        + [ingest.vector_id("b.pdf", "new-b", i) for i in range(2)]
+    )
+    rows = {row.source: row for row in session.rows}
+    assert rows["a.pdf"].chunk_count == 6
+    assert rows["b.pdf"].chunk_count == 2
+
+
+def test_changed_document_replaces_all_old_vectors(corpus):
+    session, documents = corpus
+    session.rows.append(ingest.DocumentModel(source="a.pdf", checksum="old-a", chunk_count=3))
+    docsearch = StubDocsearch()
+
+    ingest.ingest_corpus(docsearch, documents)
+
+    assert docsearch.deleted == [ingest.vector_id("a.pdf", "old-a", i) for i in range(3)]
+    assert {row.source: row.checksum for row in session.rows} == {"a.pdf": "new-a", "b.pdf": "new-b"}
+
+
+def test_unparseable_document_is_skipped(corpus, monkeypatch):
+    session, documents = corpus
+
+    def parse(source, start, end, chunk_size, chunk_overlap):
+        if source == "a.pdf" and start == 1:
+            raise ValueError("encrypted")
+        return _parse_pages(source, start, end, chunk_size, chunk_overlap)
+
+    monkeypatch.setattr(ingest, "_parse_pages", parse)
+    docsearch = StubDocsearch()
+
+    assert ingest.ingest_corpus(docsearch, documents) == 1
+
+    upserted_a = {vector_id for vector_id, text in docsearch.upserted if text.startswith("a.pdf")}
+    assert upserted_a and upserted_a <= set(docsearch.deleted)
+    assert [row.source for row in session.rows] == ["b.pdf"]
+
+
+def test_identical_files_keep_separate_vectors(corpus, monkeypatch):
+    session, _ = corpus
+    sources = ["acts/a.pdf", "constitution/a.pdf"]
+
+    def page_tasks(documents, pages_per_task):
+        for document in documents:
+            document["tasks"] = 1
+            yield document, 0, 1
+
+    def parse(source, start, end, chunk_size, chunk_overlap):
+        return [(f"same text {i}", 0) for i in range(2)]
+
+    checksums = {source: "same" for source in sources}
+    monkeypatch.setattr(ingest, "_page_tasks", page_tasks)
+    monkeypatch.setattr(ingest, "_parse_pages", parse)
+    monkeypatch.setattr(ingest, "file_checksum", lambda source: checksums[source])
+    documents = [
+        {"source": source, "title": source, "collection": source.split("/")[0]}
+        for source in sources
+    ]
+    docsearch = StubDocsearch()
+
+    assert ingest.ingest_corpus(docsearch, documents) == 2
+
+    assert len(docsearch.metadata) == 4
+    assert sorted(metadata["collection"] for metadata in docsearch.metadata.values()) == [
+        "acts", "acts", "constitution", "constitution",
+    ]
+
+    # Changing one copy only replaces that copy's vectors.
+    checksums["acts/a.pdf"] = "changed"
+    ingest.ingest_corpus(docsearch, documents)
+
+    assert docsearch.deleted == [ingest.vector_id("acts/a.pdf", "same", i) for i in range(2)]
+    assert {ingest.vector_id("constitution/a.pdf", "same", i) for i in range(2)} <= set(docsearch.metadata)
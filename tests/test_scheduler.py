@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from fastapi.exceptions import HTTPException
+
+from chat import scheduler as scheduler_module
+from chat.scheduler import FairScheduler, RateLimiter
+
+
+async def _hold(scheduler, user_id):
+    slot = scheduler.slot(user_id)
+    await slot.__aenter__()
+    return slot
+
+
+def test_weighted_round_robin_grant_order():
+    async def scenario():
+        scheduler = FairScheduler(slots=1, max_queued_per_user=10)
+        order = []
+
+        async def waiter(user_id, weight):
+            async with scheduler.slot(user_id, weight=weight):
+                order.append(user_id)
+
+        holder = await _hold(scheduler, "holder")
+        tasks = [
+            asyncio.create_task(waiter(user_id, weight))
+            for user_id, weight in [("a", 2), ("a", 2), ("a", 2), ("b", 1), ("b", 1)]
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.depth == 5
+
+        await holder.__aexit__(None, None, None)
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+        assert scheduler.busy == 0
+        assert scheduler.depth == 0
+        return order
+
+    # "a" gets two grants per round, "b" one.
+    assert asyncio.run(scenario()) == ["a", "a", "b", "a", "b"]
+
+
+def test_cancelled_waiter_hands_granted_slot_to_next():
+    async def scenario():
+        scheduler = FairScheduler(slots=1, max_queued_per_user=10)
+        granted = []
+
+        async def waiter(user_id):
+            async with scheduler.slot(user_id):
+                granted.append(user_id)
+
+        holder = await _hold(scheduler, "holder")
+        first = asyncio.create_task(waiter("a"))
+        second = asyncio.create_task(waiter("b"))
+        await asyncio.sleep(0)
+
+        # Release grants the slot to "a", which is cancelled before it runs.
+        await holder.__aexit__(None, None, None)
+        first.cancel()
+        await asyncio.wait_for(asyncio.gather(first, second, return_exceptions=True), timeout=5)
+
+        assert first.cancelled()
+        assert granted == ["b"]
+        assert scheduler.busy == 0
+        assert scheduler.depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_background_waits_for_queued_requests():
+    async def scenario():
+        scheduler = FairScheduler(slots=1, max_queued_per_user=10)
+        order = []
+
+        async def waiter(user_id, background=False):
+            async with scheduler.slot(user_id, background=background):
+                order.append(user_id)
+
+        holder = await _hold(scheduler, "holder")
+        tasks = [asyncio.create_task(waiter("summary", background=True))]
+        tasks += [asyncio.create_task(waiter(user_id)) for user_id in ("a", "b")]
+        await asyncio.sleep(0)
+        assert scheduler.depth == 2
+
+        await holder.__aexit__(None, None, None)
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+        assert scheduler.busy == 0
+        return order
+
+    assert asyncio.run(scenario()) == ["a", "b", "summary"]
+
+
+def test_queue_limit_per_user():
+    async def scenario():
+        scheduler = FairScheduler(slots=1, max_queued_per_user=1)
+        holder = await _hold(scheduler, "holder")
+        waiting = asyncio.create_task(_hold(scheduler, "a"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as exc:
+            await _hold(scheduler, "a")
+        assert exc.value.status_code == 429
+
+        await holder.__aexit__(None, None, None)
+        await (await waiting).__aexit__(None, None, None)
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refill_and_retry_after(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler_module.time, "time", lambda: now[0])
+    limiter = RateLimiter()
+    tier = {"requests_per_minute": 60, "burst": 2, "weight": 1}
+
+    limiter.check(1, tier)
+    limiter.check(1, tier)
+    with pytest.raises(HTTPException) as exc:
+        limiter.check(1, tier)
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "2"
+
+    # Other users have their own bucket.
+    limiter.check(2, tier)
+
+    # One request per second refills.
+    now[0] += 1
+    limiter.check(1, tier)
+    with pytest.raises(HTTPException):
+        limiter.check(1, tier)
+
+    # Refilling stops at the burst size.
+    now[0] += 60
+    limiter.check(1, tier)
+    limiter.check(1, tier)
+    with pytest.raises(HTTPException):
+        limiter.check(1, tier)
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+from jose import jwt
+from sqlalchemy.exc import IntegrityError
+
+from core import security
+from core.security import RevocationList, TokenCache
+
+
+class StubQuery:
+    def __init__(self, session):
+        self._session = session
+
+    def filter(self, *args):
+        return self
+
+    def all(self):
+        return [(row.jti,) for row in self._session.rows]
+
+    def delete(self):
+        return 0
+
+
+class StubSession:
+    """Holds committed revocations; a duplicate `jti` fails on commit like the unique index."""
+
+    def __init__(self, rows=None):
+        self.rows = rows if rows is not None else []
+        self.pending = []
+
+    def query(self, *args):
+        return StubQuery(self)
+
+    def add(self, row):
+        self.pending.append(row)
+
+    def commit(self):
+        pending, self.pending = self.pending, []
+        committed = {row.jti for row in self.rows}
+        for row in pending:
+            if row.jti in committed:
+                raise IntegrityError("INSERT INTO revoked_tokens", {}, Exception("Duplicate entry"))
+            self.rows.append(row)
+            committed.add(row.jti)
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(security.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def revocations(monkeypatch):
+    rows = []
+    monkeypatch.setattr(security, "SessionLocal", lambda: StubSession(rows))
+    revoked = RevocationList(sync_seconds=60)
+    monkeypatch.setattr(security, "revoked_tokens", revoked)
+    monkeypatch.setattr(security, "token_cache", TokenCache(max_size=10))
+    return revoked, rows
+
+
+def test_token_cache_drops_expired_payloads(clock):
+    cache = TokenCache(max_size=10)
+    cache.put("token", {"id": 1, "exp": 1060})
+
+    assert cache.get("token") == {"id": 1, "exp": 1060}
+    clock[0] = 1060
+    assert cache.get("token") is None
+
+
+def test_token_cache_evicts_least_recently_used(clock):
+    cache = TokenCache(max_size=2)
+    cache.put("a", {"exp": 2000})
+    cache.put("b", {"exp": 2000})
+    cache.get("a")
+    cache.put("c", {"exp": 2000})
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_revoked_token_is_rejected(revocations):
+    revoked, rows = revocations
+    token = jwt.encode(
+        {"id": 1, "jti": "abc", "type": "refresh", "exp": int(time.time()) + 60},
+        security.settings.JWT_SECRET,
+        algorithm=security.settings.JWT_ALGORITHM,
+    )
+    payload = security.get_token_payload(token)
+    assert payload["jti"] == "abc"
+
+    assert revoked.revoke(payload, StubSession(rows))
+    assert [row.jti for row in rows] == ["abc"]
+    # The payload is still cached, but the revocation applies immediately.
+    assert revoked.is_revoked("abc")
+    assert security.get_token_payload(token) is None
+
+
+def test_revoking_twice_reports_already_revoked(revocations):
+    revoked, rows = revocations
+    payload = {"id": 1, "jti": "abc", "exp": int(time.time()) + 60}
+
+    assert revoked.revoke(payload, StubSession(rows))
+    # A second process that has not synced yet still loses on the unique jti.
+    assert not RevocationList(sync_seconds=60).revoke(payload, StubSession(rows))
+    assert len(rows) == 1
+
+
+def test_revocations_from_other_processes_apply_after_sync(revocations):
+    revoked, rows = revocations
+    assert not revoked.is_revoked("abc")
+
+    RevocationList(sync_seconds=60).revoke({"id": 1, "jti": "abc", "exp": int(time.time()) + 60}, StubSession(rows))
+    assert not revoked.is_revoked("abc")
+    revoked.sync()
+    assert revoked.is_revoked("abc")
@@ -15,6 +15,7 @@ class UserModel(Base):
         password (str): Hashed password of the user.
         is_active (bool): Indicates if the user account is active.
         is_verified (bool): Indicates if the user email is verified.
+        tier (str): Account tier, used for chat rate limits and scheduling weight.
         verified_at (DateTime): Date and time when the email was verified.
         registered_at (DateTime): Date and time when the user registered.
         updated_at (DateTime): Date and time when the user record was last updated.
@@ -29,6 +30,7 @@ class UserModel(Base):
     password = Column(String(100))
     is_active = Column(Boolean, default=False)
     is_verified = Column(Boolean, default=False)
+    tier = Column(String(20), nullable=False, default="free", server_default="free")
     verified_at = Column(DateTime, nullable=True, default=None)
     registered_at = Column(DateTime, nullable=True, default=None)
     updated_at = Column(DateTime, nullable=True, default=None, onupdate=datetime.now)